@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass(order=True, frozen=True)
+@dataclass(order=True, frozen=True, slots=True)
 class Attributes:
     r"""
     Immutable object to group attributes, and do operations on them.
@@ -122,6 +122,60 @@ class Attributes:
         
         return True
 
+    def pack(self) -> int:
+        """The three attributes in a single integer, for hot loops.
+        See `pack_attributes()`."""
+        return pack_attributes(self.phy, self.men, self.tac)
+
+
+# Packed attributes
+#   Each attribute gets its own 20-bit field, followed by a "guard" bit:
+#       bits  0-19: phy    bit 20: guard
+#       bits 21-40: men    bit 41: guard
+#       bits 42-61: tac    bit 62: guard
+#   Adding two packed values adds each attribute separately (as long as
+#   they stay under 2**20). Comparing them takes a single subtraction: we
+#   set all the guard bits, subtract the requirements, and any attribute
+#   that was too low borrows (and clears) its own guard bit, without
+#   touching the other fields.
+_FIELD_BITS = 21
+_VALUE_MASK = (1 << (_FIELD_BITS - 1)) - 1
+_GUARDS = sum(1 << (_FIELD_BITS * i + _FIELD_BITS - 1) for i in range(3))
+
+
+def pack_attributes(phy: int, men: int, tac: int) -> int:
+    """Packs three non-negative attributes into a single integer.
+
+        >>> squad = pack_attributes(200, 150, 300)
+        >>> training = Attributes(20, 120, 140).pack()
+        >>> print(unpack_attributes(squad + training))
+        (220 / 270 / 440)
+        >>> print(packed_clears(squad + training, Attributes(220, 250, 400).pack()))
+        True
+        >>> print(packed_clears(squad + training, Attributes(221, 250, 400).pack()))
+        False
+        >>> pack_attributes(-20, 0, 0)
+        Traceback (most recent call last):
+        ...
+        ValueError: Only attributes between 0 and 1048575 can be packed
+    """
+    if not (0 <= phy <= _VALUE_MASK and 0 <= men <= _VALUE_MASK and 0 <= tac <= _VALUE_MASK):
+        raise ValueError(f"Only attributes between 0 and {_VALUE_MASK} can be packed")
+    return phy | (men << _FIELD_BITS) | (tac << (2 * _FIELD_BITS))
+
+
+def unpack_attributes(packed: int) -> Attributes:
+    return Attributes(
+        packed & _VALUE_MASK,
+        (packed >> _FIELD_BITS) & _VALUE_MASK,
+        (packed >> (2 * _FIELD_BITS)) & _VALUE_MASK)
+
+
+def packed_clears(packed: int, packed_requirements: int) -> bool:
+    """Same as `Attributes.clears()`, on packed attributes."""
+    return ((packed | _GUARDS) - packed_requirements) & _GUARDS == _GUARDS
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,195 @@
+"""Benchmarks of the planner's hot paths.
+
+    python benchmark.py -o bench.json
+    python benchmark.py -o bench-new.json --baseline bench.json
+
+Runs against the bundled `Squadron-*.csv` exports and against seeded
+synthetic squadrons. With `--baseline`, any benchmark slower than the
+baseline by more than `--tolerance` is reported, and the exit code is 1.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+from attributes import Attributes
+from csvparser import load_squadron
+from feasibility import iter_programs, sweep
+from transitions import iter_training_states
+from typing import Callable, Optional
+from squadronplanner import Member, Mission, Squadron
+
+
+def make_synthetic_squadron(
+    seed: int,
+    nb_members: int,
+    nb_missions: int,
+    max_training_attr: int = 280
+) -> Squadron:
+    """A random (but reproducible) squadron, with members and missions in
+    the same ranges as the real exports."""
+    rng = random.Random(seed)
+    members = [
+        Member(
+            name=f"Member {id}",
+            attr=Attributes(rng.randint(20, 130), rng.randint(20, 130), rng.randint(20, 130)),
+            level=rng.randint(1, 60),
+            job="Synthetic",
+            id=id)
+        for id in range(1, nb_members + 1)]
+    missions = [
+        Mission(
+            name=f"Mission {index}",
+            requirements=Attributes(rng.randint(100, 480), rng.randint(100, 480), rng.randint(100, 480)),
+            level=rng.randint(1, 60),
+            xp_reward=rng.randrange(7500, 30001, 1500),
+            is_available=rng.random() < 0.8)
+        for index in range(nb_missions)]
+    training_attr = rng.choice(list(iter_training_states(max_training_attr)))
+    return Squadron(members, missions, training_attr, max_training_attr)
+
+
+def _copy_squadron(squadron: Squadron) -> Squadron:
+    """Same data, but nothing built yet."""
+    return Squadron(
+        squadron.members,
+        squadron.missions,
+        squadron.training_attr,
+        squadron.max_training_attr,
+        squadron.remaining_daily_courses,
+        squadron.squad_size,
+        squadron.max_built_squads)
+
+
+def _find_all_lowest(squadron: Squadron) -> None:
+    for mission in squadron.iter_available_missions():
+        squadron.find_lowest_qualifying_squad(mission, squadron.training_attr)
+
+
+def _build_programs(squadron: Squadron, nb_courses: int) -> None:
+    for _ in iter_programs(nb_courses, squadron.training_attr, squadron.max_training_attr):
+        pass
+
+
+def _full_sweep(squadron: Squadron, max_courses: int) -> None:
+    for nb_courses in range(max_courses + 1):
+        sweep(squadron, nb_courses)
+
+
+def time_it(
+    function: Callable[[], None],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None
+) -> dict:
+    """Runs `function` `repeat` times, each after `setup` (not timed).
+    Times are in seconds."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {"min": times[0], "median": times[len(times) // 2], "repeat": repeat}
+
+
+def iter_datasets(quick: bool = False, max_courses: int = 3):
+    """Yields (name, squadron, sweep depth) for every dataset to benchmark.
+
+    The big synthetic rosters can't have all their squads built, so their
+    sweeps are kept shallow to finish in a reasonable time."""
+    bundled_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(glob.glob(os.path.join(bundled_dir, 'Squadron-*.csv'))):
+        yield os.path.basename(filename), load_squadron(filename), max_courses
+        if quick:
+            break
+
+    # (nb_members, nb_missions, max_training_attr, sweep depth)
+    if quick:
+        configs = [(8, 100, 280, max_courses), (24, 100, 280, 1)]
+    else:
+        configs = [
+            (8, 100, 280, max_courses),
+            (16, 200, 200, max_courses),
+            (24, 200, 280, 2),
+            (32, 300, 400, 1),
+            (64, 100, 280, 0),
+        ]
+    for seed, (nb_members, nb_missions, max_training_attr, depth) in enumerate(configs):
+        name = f"synthetic-{nb_members}m-{nb_missions}mi-{max_training_attr}max"
+        squadron = make_synthetic_squadron(seed, nb_members, nb_missions, max_training_attr)
+        yield name, squadron, min(depth, max_courses)
+
+
+def run_benchmarks(quick: bool = False, repeat: int = 5, max_courses: int = 3) -> dict:
+    results = dict()
+    for dataset, squadron, sweep_depth in iter_datasets(quick, max_courses):
+        built = _copy_squadron(squadron)
+        built.build_squads()
+
+        # The squads are built once, outside of the timings, but every run
+        #   starts without the answers of the previous one: otherwise we
+        #   would only time the lookups in `lowest_squad_cache`.
+        def forget_answers() -> None:
+            built.lowest_squad_cache.clear()
+
+        benchmarks = {
+            "build_squads": lambda: _copy_squadron(squadron).build_squads(),
+            "find_lowest_qualifying_squad": lambda: _find_all_lowest(built),
+            f"training_programs_{max_courses}_courses": lambda: _build_programs(built, max_courses),
+            f"sweep_0_to_{sweep_depth}_courses": lambda: _full_sweep(built, sweep_depth),
+        }
+        for benchmark, function in benchmarks.items():
+            name = f"{dataset}/{benchmark}"
+            results[name] = time_it(function, repeat, forget_answers)
+            print(f"{results[name]['min'] * 1000:10.3f} ms  {name}", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Names of the benchmarks that got slower than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["min"] / baseline[name]["min"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the planner's hot paths.")
+    parser.add_argument('-o', '--output', default='bench.json')
+    parser.add_argument('--baseline', help="results of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown before reporting a regression (default: 0.2 = 20%%)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-courses', type=int, default=3)
+    parser.add_argument('--quick', action='store_true', help="only a few small datasets")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.repeat, args.max_courses)
+    with open(args.output, 'w') as output:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }, output, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions:", *regressions, sep='\n')
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
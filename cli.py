@@ -0,0 +1,365 @@
+"""Command line of the squadron planner.
+
+    python cli.py load Squadron-2021-09-24.csv
+    python cli.py doable Squadron-2021-09-24.csv --courses PHY_MEN,PHY,PHY
+    python cli.py lowest-squads Squadron-2021-09-24.csv --courses PHY_MEN,PHY,PHY
+    python cli.py sweep Squadron-2021-09-24.csv --depth 3 --min-missions 7
+    python cli.py sweep Squadron-2021-09-24.csv --depth 5 -o sweep-5.jsonl
+    python cli.py report Squadron-2021-09-24.csv
+    python cli.py top-squads Squadron-2021-09-24.csv -k 5 --metric xp_per_attr --depth 2
+    python cli.py rotation Squadron-2021-09-24.csv --days 30 --missions-per-day 2
+    python cli.py history . --member Cecily
+    python cli.py compare-rules Squadron-2021-09-24.csv --depth 3 --rules default rebalance_first
+
+Everything but the library itself is imported only by the subcommands
+that need it, so that starting the command stays fast.
+"""
+import argparse
+import sys
+from typing import Optional
+from squadronplanner import Course, Squadron, TrainingProgram
+
+
+def parse_courses(text: str) -> tuple[Course, ...]:
+    """ "PHY_MEN,PHY,PHY" -> (Course.PHY_MEN, Course.PHY, Course.PHY)"""
+    if text.strip() == '':
+        return tuple()
+    try:
+        return tuple(Course[name.strip().upper()] for name in text.split(','))
+    except KeyError as error:
+        names = ", ".join(course.name for course in Course)
+        raise argparse.ArgumentTypeError(f"unknown course {error} (expected: {names})") from None
+
+
+def _parse_int(text: str, minimum: int) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number: {text!r}") from None
+    if value < minimum:
+        raise argparse.ArgumentTypeError(f"expected a number >= {minimum}, got {value}")
+    return value
+
+
+def non_negative_int(text: str) -> int:
+    return _parse_int(text, 0)
+
+
+def positive_int(text: str) -> int:
+    return _parse_int(text, 1)
+
+
+def parse_rule_set(text: str):
+    """A built-in rule set by name, or a JSON file of rules."""
+    from courserules import get_rule_set
+    try:
+        return get_rule_set(text)
+    except OSError as error:
+        raise argparse.ArgumentTypeError(f"cannot read rule set {text}: {error.strerror}") from None
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"bad rule set {text}: {error}") from None
+
+
+def _load(args) -> Squadron:
+    from csvparser import load_squadron
+    return load_squadron(args.export)
+
+
+def _program(args, squadron: Squadron) -> TrainingProgram:
+    return TrainingProgram(args.courses, squadron.training_attr, squadron.max_training_attr)
+
+
+def _write_records(args, records) -> None:
+    from resultstream import open_sink, write_records
+
+    with open_sink(args.output, args.format) as sink:
+        nb_records = write_records(records, sink)
+    print(f"{nb_records} records written to {args.output}")
+
+
+def cmd_load(args) -> None:
+    squadron = _load(args)
+    print(f"Training attributes: {squadron.training_attr} (max {squadron.max_training_attr})")
+    print("Squadron Members:")
+    print(*squadron.members, sep='\n')
+    print("Available Missions:")
+    print(*squadron.iter_available_missions(), sep='\n')
+
+
+def cmd_doable(args) -> None:
+    squadron = _load(args)
+    program = _program(args, squadron)
+    if args.output is not None:
+        from resultstream import iter_doable_records
+        _write_records(args, iter_doable_records(squadron, program))
+        return
+    print(program)
+    print(*squadron.iter_doable_missions_with_program(program), sep='\n')
+
+
+def cmd_lowest_squads(args) -> None:
+    squadron = _load(args)
+    program = _program(args, squadron)
+    if args.output is not None:
+        from resultstream import iter_lowest_squad_records
+        _write_records(args, iter_lowest_squad_records(squadron, program))
+        return
+    print(program)
+    squadron.print_lowest_squad_for_all_doable_missions(program)
+
+
+def cmd_sweep(args) -> None:
+    from resultcache import cached_sweep
+
+    squadron = _load(args)
+    if args.output is not None:
+        # Streamed, program after program, instead of a table in memory
+        from resultstream import iter_sweep_records
+        _write_records(args, iter_sweep_records(squadron, args.depth, not args.include_redundant,
+                                                args.min_missions))
+        return
+    table = cached_sweep(squadron, args.depth)
+    print(f"Initial\t{squadron.training_attr}")
+    for program, doable_missions, _ in table.iter_rows():
+        if program.is_redundant and not args.include_redundant:
+            continue
+        if len(doable_missions) < args.min_missions:
+            continue
+        print(program)
+        print(*doable_missions, sep='\n')
+        print()
+
+
+def cmd_report(args) -> None:
+    """The output of the original script, with the thresholds as options."""
+    from resultcache import cached_sweeps
+
+    sq = _load(args)
+    training_attr = sq.training_attr
+    max_training_attr = sq.max_training_attr
+    # Straight from the cache, if the data didn't change since the last run
+    tables = cached_sweeps(sq, 3)
+
+    print("Squadron Members:")
+    print(*sq.members, sep='\n')
+
+    sq.build_squads()
+    print("Squads:")
+    print(*sq.squads, sep='\n')
+    print()
+
+    print("Nb of qualifying squad for each available mission")
+    for mission in sq.iter_available_missions():
+        nb = sq.count_qualifying_squads(mission, sq.training_attr)
+        print(f"{nb}\t{mission}")
+
+    print("Lowest qualifying squad for each available mission")
+    for mission in sq.iter_available_missions():
+        squad = sq.find_lowest_qualifying_squad(mission, sq.training_attr)
+        print(f"{squad}\t{mission}")
+
+    # Tests for training courses:
+    print()
+    print("Training courses")
+    print(training_attr)
+    print(max_training_attr)
+
+    prog1 = TrainingProgram((Course.PHY,), training_attr, max_training_attr)
+    print(prog1)
+
+    print()
+    print("Resulting delta for specified course on specifiied initial stats")
+    print(f"Initial\t{training_attr}")
+    for course in list(Course):
+        new_attr = prog1.calculate_one_course(training_attr, course)
+        delta = new_attr - training_attr
+        print(f"{course.name:7}\t{new_attr}    {delta}")
+    print("****************")
+
+    print()
+    print("Doable missions with no training")
+    empty_prog = TrainingProgram(tuple(), training_attr, max_training_attr)
+    print(empty_prog)
+    print(*sq.iter_doable_missions_with_program(empty_prog), sep='\n')
+    print("****************")
+
+    print()
+    print("Doable missions with one course, grouped by course")
+    print(f"Initial\t{training_attr}")
+    for course in list(Course):
+        prog = TrainingProgram((course,), training_attr, max_training_attr)
+        print(prog)
+        print(*sq.iter_doable_missions_with_program(prog), sep='\n')
+        print()
+    print("****************")
+
+    thresholds = {2: args.threshold_1_courses, 3: args.threshold_2_courses}
+    names = {2: "two", 3: "three"}
+    for nb_courses in (2, 3):
+        print()
+        print(f"Doable missions with {names[nb_courses]} courses, grouped by training program")
+        print(f"Initial\t{training_attr}")
+        for prog, doable_missions, _ in tables[nb_courses].iter_rows():
+            if prog.is_redundant:
+                continue
+            # If training prog offers no new missions:
+            if len(doable_missions) <= thresholds[nb_courses]:
+                continue
+            print(prog)
+            print(*doable_missions, sep='\n')
+            print()
+        print("****************")
+
+    train_prog = _program(args, sq)
+    print()
+    print(train_prog)
+    sq.print_lowest_squad_for_all_doable_missions(train_prog)
+
+
+def cmd_top_squads(args) -> None:
+    from feasibility import iter_programs
+    from squadranking import Metric, top_squads
+
+    squadron = _load(args)
+    programs = (program
+                for nb_courses in range(args.depth + 1)
+                for program in iter_programs(nb_courses, squadron.training_attr,
+                                             squadron.max_training_attr, skip_redundant=True))
+    print(*top_squads(squadron, programs, args.k, Metric(args.metric)), sep='\n')
+
+
+def cmd_rotation(args) -> None:
+    from rotation import RotationScheduler
+
+    squadron = _load(args)
+    program = _program(args, squadron)
+    scheduler = RotationScheduler(squadron, args.days, args.missions_per_day, program.attr,
+                                  balance=not args.most_xp)
+    print(program)
+    print(scheduler.plan())
+
+
+def cmd_history(args) -> None:
+    from history import SnapshotHistory
+
+    history = SnapshotHistory()
+    nb_new = history.ingest_directory(args.directory)
+    print(f"{nb_new} new snapshots ingested")
+    if args.member is not None:
+        print(f"History of {args.member}:")
+        for date, attr, level in history.member_history(args.member):
+            print(f"{date}  {attr}  Lv. {level:2}")
+        return
+
+    print("Training attributes:")
+    for date, attr, max_attr in history.training_history():
+        print(f"{date}  {attr}  (max {max_attr})")
+    print("First day each mission was doable without training:")
+    for name, date in history.first_doable_dates().items():
+        print(f"{date or 'never':10}  {name}")
+
+
+def cmd_compare_rules(args) -> None:
+    from rulecomparison import compare_rule_sets
+
+    squadron = _load(args)
+    comparison = compare_rule_sets(squadron, args.rules, args.depth)
+    print(*comparison.iter_report_lines(args.limit), sep='\n')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Plan squadron training courses and missions.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(
+        name: str,
+        function,
+        help: str,
+        with_courses: bool = False,
+        with_output: bool = False
+    ) -> argparse.ArgumentParser:
+        subparser = subparsers.add_parser(name, help=help)
+        subparser.add_argument('export', help="Squadron-*.csv export")
+        if with_courses:
+            subparser.add_argument('--courses', type=parse_courses, default=tuple(),
+                                   help="training program, eg: PHY_MEN,PHY,PHY (default: none)")
+        if with_output:
+            subparser.add_argument('-o', '--output',
+                                   help="write the results to this file instead of printing them")
+            subparser.add_argument('--format', choices=['jsonl', 'csv', 'bin'],
+                                   help="format of --output (default: from its extension)")
+        subparser.set_defaults(function=function)
+        return subparser
+
+    add_command('load', cmd_load, "show the squadron of an export")
+    add_command('doable', cmd_doable, "doable missions after a training program",
+                with_courses=True, with_output=True)
+    add_command('lowest-squads', cmd_lowest_squads,
+                "lowest squad for each doable mission after a training program",
+                with_courses=True, with_output=True)
+
+    sweep = add_command('sweep', cmd_sweep, "doable missions of every program of N courses",
+                        with_output=True)
+    sweep.add_argument('--depth', type=non_negative_int, default=3, help="number of courses (default: 3)")
+    sweep.add_argument('--min-missions', type=non_negative_int, default=0,
+                       help="only show programs with at least this many doable missions")
+    sweep.add_argument('--include-redundant', action='store_true',
+                       help="also show programs with a useless course")
+
+    report = add_command('report', cmd_report, "everything the original script printed")
+    report.add_argument('--threshold-1-courses', type=non_negative_int, default=6,
+                        help="hide 2-course programs with this many doable missions or fewer")
+    report.add_argument('--threshold-2-courses', type=non_negative_int, default=6,
+                        help="hide 3-course programs with this many doable missions or fewer")
+    report.add_argument('--courses', type=parse_courses,
+                        default=(Course.PHY_MEN, Course.PHY, Course.PHY),
+                        help="program to show the lowest squads for")
+
+    top = add_command('top-squads', cmd_top_squads,
+                      "best (mission, squad) pairs across the programs of up to N courses")
+    top.add_argument('-k', type=positive_int, default=5, help="number of pairs (default: 5)")
+    top.add_argument('--metric', choices=['aggregate', 'xp_per_attr', 'over_levelled'],
+                     default='aggregate', help="how squads are ranked (default: aggregate)")
+    top.add_argument('--depth', type=non_negative_int, default=0,
+                     help="programs of up to this many courses (default: 0)")
+
+    rotation = add_command('rotation', cmd_rotation,
+                           "which squad does which mission each day, to level up everyone",
+                           with_courses=True)
+    rotation.add_argument('--days', type=positive_int, default=7, help="number of days (default: 7)")
+    rotation.add_argument('--missions-per-day', type=positive_int, default=1,
+                          help="missions per day (default: 1)")
+    rotation.add_argument('--most-xp', action='store_true',
+                          help="favor the most XP over an even roster")
+
+    compare = add_command('compare-rules', cmd_compare_rules,
+                          "programs whose doable missions depend on the course rules")
+    compare.add_argument('--rules', nargs='+', type=parse_rule_set,
+                         default=[parse_rule_set(name) for name in ('default', 'rebalance_first', 'no_fallback')],
+                         help="built-in rule sets or JSON files (default: all the built-in ones)")
+    compare.add_argument('--depth', type=non_negative_int, default=3,
+                         help="programs of up to this many courses (default: 3)")
+    compare.add_argument('--limit', type=non_negative_int, default=None,
+                         help="show at most this many programs")
+
+    history = subparsers.add_parser('history', help="ingest the daily exports and show how things changed")
+    history.add_argument('directory', nargs='?', default='.', help="directory of Squadron-*.csv files")
+    history.add_argument('--member', help="show the history of this member")
+    history.set_defaults(function=cmd_history)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'output', None) is not None:
+        from resultstream import sink_format
+        try:
+            sink_format(args.output, args.format)
+        except ValueError as error:
+            parser.error(str(error))
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,286 @@
+import hashlib
+import instrumentation
+import json
+from attributes import Attributes
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+# The default rules, as data.
+#
+# Each course tries its deltas in the order of the steps, and the first one
+#   that keeps every attribute between 0 and the max is applied.
+#   "delta" means "change in...", so "intended_delta" means "intended
+#   change to base attributes".
+#
+# intended_delta: best case scenario, but very rare.
+# balanced_delta: when we start at max_aggregate. Most common scenario.
+#
+# If neither fits, then one attribute will either go negative,
+#   or break the max after the delta.
+# Since we assume all individual attributes are multiples of 20,
+#   we have these solutions:
+#   A) Reduce the delta.              Eg: ( 40/  0/  0) -> ( 20/  0/ 0)
+#   B) Reduce the balancing.          Eg: (-40/ 20/ 20) -> (-20/ 20/20)
+#   C) Balance on a single attribute. Eg: ( 40/-20/-20) -> ( 40/-40/ 0)
+# Because of the "multiples of 20" rule, not all of these solution can
+#   be used on all courses.
+# Because the goal of training courses is to *increase* the stats,
+#   we prioritize the solution with the biggest increases.
+#
+# If all attempts fail, then the course cannot improve anything,
+#   and the attributes stay the same.
+#
+# NB.: These rules attempt to emulate the in-game rules, and none of our
+#   rules & assumptions have been tested yet. Variants of them can be
+#   compared side by side with `rulecomparison.compare_rule_sets`, and
+#   checked against what the game did with `check_observations`.
+ATTRIBUTE_STEP = 20
+
+DEFAULT_STEPS = (
+    "intended_delta",
+    "balanced_delta",
+    "reduced_delta",
+    "reduced_balancing_delta",
+    "reduced_delta_1",
+    "reduced_delta_2",
+    "rebalanced_1_delta",
+    "rebalanced_2_delta",
+)
+
+_DEFAULT_DELTAS = {
+    "PHY": {
+        "intended_delta": (40, 0, 0),
+        "balanced_delta": (40, -20, -20),
+        "reduced_delta": (20, 0, 0),
+        "rebalanced_1_delta": (40, -40, 0),
+        "rebalanced_2_delta": (40, 0, -40),
+    },
+    "MEN": {
+        "intended_delta": (0, 40, 0),
+        "balanced_delta": (-20, 40, -20),
+        "reduced_delta": (0, 20, 0),
+        "rebalanced_1_delta": (-40, 40, 0),
+        "rebalanced_2_delta": (0, 40, -40),
+    },
+    "TAC": {
+        "intended_delta": (0, 0, 40),
+        "balanced_delta": (-20, -20, 40),
+        "reduced_delta": (0, 0, 20),
+        "rebalanced_1_delta": (-40, 0, 40),
+        "rebalanced_2_delta": (0, -40, 40),
+    },
+    "PHY_MEN": {
+        "intended_delta": (20, 20, 0),
+        "balanced_delta": (20, 20, -40),
+        "reduced_balancing_delta": (20, 20, -20),
+        "reduced_delta_1": (20, 0, 0),
+        "reduced_delta_2": (0, 20, 0),
+        "rebalanced_1_delta": (20, 0, -20),
+        "rebalanced_2_delta": (0, 20, -20),
+    },
+    "PHY_TAC": {
+        "intended_delta": (20, 0, 20),
+        "balanced_delta": (20, -40, 20),
+        "reduced_balancing_delta": (20, -20, 20),
+        "reduced_delta_1": (20, 0, 0),
+        "reduced_delta_2": (0, 0, 20),
+        "rebalanced_1_delta": (20, -20, 0),
+        "rebalanced_2_delta": (0, -20, 20),
+    },
+    "MEN_TAC": {
+        "intended_delta": (0, 20, 20),
+        "balanced_delta": (-40, 20, 20),
+        "reduced_balancing_delta": (-20, 20, 20),
+        "reduced_delta_1": (0, 20, 0),
+        "reduced_delta_2": (0, 0, 20),
+        "rebalanced_1_delta": (-20, 20, 0),
+        "rebalanced_2_delta": (-20, 0, 20),
+    },
+}
+
+
+@dataclass(eq=False)
+class RuleSet:
+    """Training course rules, as data: for each course (by name), the
+    deltas to try, in the order of `steps`.
+
+    Rule sets compare (and hash) by identity; use `fingerprint()` to tell
+    whether two of them hold the same rules.
+
+    Bump `version` whenever the deltas or the steps of a named rule set
+    change, so that what was saved on disk for it gets rebuilt.
+    """
+    name: str
+    version: int
+    steps: tuple[str, ...]
+    deltas: dict[str, dict[str, Attributes]]
+    # Course name -> [(step, delta)], in priority order
+    _chains: dict[str, list[tuple[str, Attributes]]] = field(init=False, repr=False, compare=False)
+    _fingerprint: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.steps = tuple(self.steps)
+        self._validate()
+        self._chains = {
+            course: [(step, deltas[step]) for step in self.steps if step in deltas]
+            for course, deltas in self.deltas.items()}
+        as_bytes = json.dumps(self.to_dict(), sort_keys=True).encode()
+        self._fingerprint = hashlib.sha256(as_bytes).hexdigest()[:12]
+
+    def _validate(self) -> None:
+        if len(set(self.steps)) != len(self.steps):
+            raise ValueError(f"Rule set {self.name!r}: duplicate steps in {self.steps}")
+        missing = set(_DEFAULT_DELTAS) - set(self.deltas)
+        if missing:
+            raise ValueError(f"Rule set {self.name!r}: no deltas for {', '.join(sorted(missing))}")
+        for course, deltas in self.deltas.items():
+            if course not in _DEFAULT_DELTAS:
+                raise ValueError(f"Rule set {self.name!r}: unknown course {course!r}")
+            for step, delta in deltas.items():
+                # Training states are on a grid: a delta off it would lead
+                #   to a state that doesn't exist.
+                if any(value % ATTRIBUTE_STEP for value in (delta.phy, delta.men, delta.tac)):
+                    raise ValueError(f"Rule set {self.name!r}, {course}, {step}: {delta} is not "
+                                     f"made of multiples of {ATTRIBUTE_STEP}")
+
+    def step_for(self, base_attr: Attributes, course: str, max_aggregate: int) -> Optional[str]:
+        """The step a course (by name) takes from `base_attr`, or None when
+        the course is useless there."""
+        chain = self._chains.get(course)
+        if chain is None:
+            raise ValueError(f"course = {course}")
+        for step, delta in chain:
+            if base_attr.has_room_for_delta(delta, max_aggregate):
+                return step
+        return None
+
+    def apply(self, base_attr: Attributes, course: str, max_aggregate: int) -> Attributes:
+        """The attributes after the course (by name, eg: "PHY_MEN")."""
+        chain = self._chains.get(course)
+        if chain is None:
+            raise ValueError(f"course = {course}")
+        for step, delta in chain:
+            if base_attr.has_room_for_delta(delta, max_aggregate):
+                return base_attr + delta
+        return base_attr
+
+    def count_step(self, base_attr: Attributes, course: str, max_aggregate: int) -> None:
+        """Counts the step a course takes, for the instrumentation.
+
+        Transition tables only keep where each course leads, and are built
+        once for many runs, so courses are counted where they are looked
+        up (see `TrainingProgram`), and a run with a cached table counts
+        the same as a cold one. Callers check `instrumentation.enabled`."""
+        step = self.step_for(base_attr, course, max_aggregate)
+        instrumentation.count("course.useless" if step is None else f"course.{step}")
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "steps": list(self.steps),
+            "deltas": {course: {step: [delta.phy, delta.men, delta.tac]
+                                for step, delta in deltas.items()}
+                       for course, deltas in self.deltas.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RuleSet':
+        """Raises ValueError, naming the bad part, if `data` is not a rule set."""
+        if not isinstance(data, dict) or not {"name", "steps", "deltas"} <= data.keys():
+            raise ValueError("A rule set needs a name, steps, and deltas")
+        name = data["name"]
+        version = data.get("version", 1)
+        if not isinstance(version, int) or isinstance(version, bool):
+            raise ValueError(f"Rule set {name!r}: version = {version!r}")
+        steps = data["steps"]
+        if not isinstance(steps, (list, tuple)) or not all(isinstance(step, str) for step in steps):
+            raise ValueError(f"Rule set {name!r}: steps must be a list of names")
+        if not isinstance(data["deltas"], dict):
+            raise ValueError(f"Rule set {name!r}: deltas must be by course")
+        deltas = dict()
+        for course, course_deltas in data["deltas"].items():
+            if not isinstance(course_deltas, dict):
+                raise ValueError(f"Rule set {name!r}, {course}: deltas must be by step")
+            deltas[course] = dict()
+            for step, delta in course_deltas.items():
+                if (not isinstance(delta, (list, tuple)) or len(delta) != 3
+                        or not all(isinstance(v, int) and not isinstance(v, bool) for v in delta)):
+                    raise ValueError(f"Rule set {name!r}, {course}, {step}: {delta!r} is not "
+                                     f"3 integers (PHY, MEN, TAC)")
+                deltas[course][step] = Attributes(*delta)
+        return cls(name, version, tuple(steps), deltas)
+
+    @classmethod
+    def load(cls, path: str) -> 'RuleSet':
+        """Reads a rule set from a JSON file (same layout as `to_dict`)."""
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+    def fingerprint(self) -> str:
+        """Short hash of the rules themselves, so that two different rule
+        sets never share a file, even with the same name and version."""
+        return self._fingerprint
+
+    def with_steps(self, name: str, steps: Iterable[str], version: int = 1) -> 'RuleSet':
+        """Same deltas, another priority order (or a subset of the steps)."""
+        return RuleSet(name, version, tuple(steps), self.deltas)
+
+
+DEFAULT_RULES = RuleSet.from_dict({
+    "name": "default",
+    "version": 1,
+    "steps": DEFAULT_STEPS,
+    "deltas": _DEFAULT_DELTAS,
+})
+
+# Other guesses of the fallback order
+REBALANCE_FIRST_RULES = DEFAULT_RULES.with_steps("rebalance_first", (
+    "intended_delta",
+    "balanced_delta",
+    "rebalanced_1_delta",
+    "rebalanced_2_delta",
+    "reduced_delta",
+    "reduced_balancing_delta",
+    "reduced_delta_1",
+    "reduced_delta_2",
+))
+NO_FALLBACK_RULES = DEFAULT_RULES.with_steps("no_fallback", ("intended_delta", "balanced_delta"))
+
+BUILTIN_RULE_SETS = {rules.name: rules
+                     for rules in (DEFAULT_RULES, REBALANCE_FIRST_RULES, NO_FALLBACK_RULES)}
+
+
+def get_rule_set(name_or_path: str) -> RuleSet:
+    """A built-in rule set by name, or a rule set from a JSON file."""
+    rules = BUILTIN_RULE_SETS.get(name_or_path)
+    if rules is not None:
+        return rules
+    return RuleSet.load(name_or_path)
+
+
+@dataclass
+class Observation:
+    """What the game did with one course."""
+    initial_attr: Attributes
+    course: str
+    observed_attr: Attributes
+    max_aggregate: int
+
+
+def check_observations(
+    rule_sets: Iterable[RuleSet],
+    observations: Iterable[Observation]
+) -> dict[str, list[Optional[Attributes]]]:
+    """For each rule set (by name), and each observation: None when the
+    rules predicted what the game did, or the wrong prediction."""
+    observations = list(observations)
+    results = dict()
+    for rules in rule_sets:
+        mismatches = []
+        for observation in observations:
+            predicted = rules.apply(observation.initial_attr, observation.course,
+                                    observation.max_aggregate)
+            mismatches.append(None if predicted == observation.observed_attr else predicted)
+        results[rules.name] = mismatches
+    return results
@@ -1,41 +1,138 @@
 import csv
+import glob
+import instrumentation
 import logging
+import os
+from attributes import Attributes
+from dataclasses import dataclass
+from typing import Optional
+from squadronplanner import Member, Mission, Squadron
 
-input_filename = "Squadron-2021-09-04.csv"
-
-rows_squadron = []
-rows_members = []
-rows_missions = []
-
-# Separate the rows by data type (squadron, member, mission)
-#
-# Code based on: https://docs.python.org/3/library/csv.html#csv.DictReader
-with open(input_filename, newline='') as csvfile:
-    dialect = csv.Sniffer().sniff(csvfile.read())
-    csvfile.seek(0)
-    datareader = csv.DictReader(csvfile, dialect=dialect)
-    for row in datareader:
-        datatype = row['Data Type'].lower()
-        print(datatype)
-        if datatype == 'squadron':
-            rows_squadron.append(row)
-        elif datatype == 'member':
-            rows_members.append(row)
-        elif datatype == 'mission':
-            rows_missions.append(row)
-        else:
-            datatype_as_seen_in_input = row['Data Type']
-            logging.warning(
-                f"In input file, data type {datatype_as_seen_in_input} is "
-                "not recognized, and the corresponding row has been ignored."
-                )
-
-print("Squadron Rows")
-print(*rows_squadron, sep='\n')
-print()
-print("Members Rows")
-print(*rows_members, sep='\n')
-print()
-print("Missions Rows")
-print(*rows_missions, sep='\n')
-print()
\ No newline at end of file
+
+class SquadronDialect(csv.Dialect):
+    """The dialect of the CSV exported from Excel. No need to sniff it."""
+    delimiter = ';'
+    quotechar = '"'
+    doublequote = True
+    skipinitialspace = False
+    lineterminator = '\r\n'
+    quoting = csv.QUOTE_MINIMAL
+
+
+@dataclass
+class RowError:
+    filename: str
+    line: int
+    message: str
+
+    def __str__(self):
+        return f"{self.filename}:{self.line}: {self.message}"
+
+
+def _to_int(row: dict, column: str) -> int:
+    value = row.get(column)
+    if value is None or value.strip() == '':
+        raise ValueError(f"column '{column}' is empty")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"column '{column}' is not a number: {value!r}") from None
+
+
+def _to_text(row: dict, column: str) -> str:
+    value = row.get(column)
+    if value is None:
+        raise ValueError(f"column '{column}' is missing")
+    return value
+
+
+def _to_attributes(row: dict) -> Attributes:
+    values = [_to_int(row, column) for column in ('Physical', 'Mental', 'Tactical')]
+    if any(value < 0 for value in values):
+        raise ValueError(f"attributes can't be negative: {values}")
+    return Attributes(*values)
+
+
+def load_squadron(filename: str, errors: Optional[list[RowError]] = None) -> Squadron:
+    """Reads a `Squadron-*.csv` export in a single pass, and returns a
+    ready-to-use `Squadron`.
+
+    Bad rows are skipped, logged with their line number, and appended to
+    `errors` (if specified).
+
+    Both layouts of the export are supported:
+      * the max training attributes in the "Squadron Max Attributes" column
+        of the squadron row (since 2021-09-04)
+      * the max training attributes in their own squadron row, flagged by
+        "Is Squadron Max Attributes?" (2021-09-03)
+    """
+    if errors is None:
+        errors = []
+
+    training_attr = None
+    max_training_attr = None
+    members = []
+    missions = []
+
+    def report(line: int, message: str) -> None:
+        error = RowError(filename, line, message)
+        errors.append(error)
+        logging.warning(f"{error} (row ignored)")
+
+    with instrumentation.phase("load_squadron"), \
+            open(filename, newline='', encoding='utf-8-sig') as csvfile:
+        datareader = csv.DictReader(csvfile, dialect=SquadronDialect)
+        for row in datareader:
+            line = datareader.line_num
+            datatype = (row.get('Data Type') or '').strip().lower()
+            try:
+                if datatype == 'squadron':
+                    if (row.get('Is Squadron Max Attributes?') or '').lower() == 'yes':
+                        max_training_attr = _to_int(row, 'Physical')
+                        continue
+                    training_attr = _to_attributes(row)
+                    if (row.get('Squadron Max Attributes') or '').strip() != '':
+                        max_training_attr = _to_int(row, 'Squadron Max Attributes')
+                elif datatype == 'member':
+                    if (row.get('Sort Order') or '').strip() != '':
+                        id = _to_int(row, 'Sort Order')
+                    else:
+                        id = len(members) + 1
+                    members.append(Member(
+                        name=_to_text(row, 'Name'),
+                        attr=_to_attributes(row),
+                        level=_to_int(row, 'Level'),
+                        job=_to_text(row, 'Class'),
+                        id=id))
+                elif datatype == 'mission':
+                    is_available = (row.get('Mission Available?') or '').lower() != 'no'
+                    missions.append(Mission(
+                        name=_to_text(row, 'Name'),
+                        requirements=_to_attributes(row),
+                        level=_to_int(row, 'Level'),
+                        xp_reward=_to_int(row, 'XP Reward'),
+                        is_available=is_available))
+                else:
+                    report(line, f"data type {row.get('Data Type')!r} is not recognized")
+            except ValueError as error:
+                report(line, str(error))
+
+    if training_attr is None:
+        raise ValueError(f"{filename}: no squadron attributes found")
+    if max_training_attr is None:
+        raise ValueError(f"{filename}: no squadron max attributes found")
+    return Squadron(members, missions, training_attr, max_training_attr)
+
+
+def load_directory(
+    directory: str = '.',
+    pattern: str = 'Squadron-*.csv',
+    errors: Optional[list[RowError]] = None
+) -> dict[str, Squadron]:
+    """Loads every export of a directory, by filename.
+
+    Since the exports are named `Squadron-YYYY-MM-DD.csv`, the filenames are
+    sorted by date."""
+    filenames = sorted(glob.glob(os.path.join(directory, pattern)))
+    return {os.path.basename(filename): load_squadron(filename, errors)
+            for filename in filenames}
@@ -0,0 +1,264 @@
+"""Deep sweeps: every program of 4 to 8 courses (several days of training),
+across a pool of processes.
+
+    python deepsweep.py Squadron-2021-09-24.csv --depth 6 --jobs 8
+
+The sequences of courses are split by their first courses (the prefix),
+and each worker walks the subtrees of its prefixes in the transition
+table. Workers only get the transition table (loaded from the disk cache)
+and the doable missions of each training state, which they never modify.
+They send back a small summary per prefix: how many sequences end on each
+state, and the first of them.
+"""
+import argparse
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from attributes import Attributes
+from feasibility import build_unlock_map, iter_missions_in_mask
+from squadronplanner import Course, Mission, Squadron, TrainingProgram, get_transition_table
+from transitions import TransitionTable
+
+
+@dataclass
+class ChunkSummary:
+    prefix: tuple[int, ...]
+    nb_sequences: int
+    nb_redundant: int
+    # State index -> (number of sequences ending there, first of them in `product()` order)
+    reached: dict[int, tuple[int, tuple[int, ...]]]
+
+
+@dataclass
+class DeepSweepResult:
+    initial_attr: Attributes
+    max_aggregate: int
+    nb_courses: int
+    missions: list[Mission]
+    nb_chunks: int
+    nb_chunks_done: int = 0
+    nb_sequences: int = 0
+    nb_redundant: int = 0
+    # Training state -> (number of sequences ending there, first of them)
+    reached: dict[Attributes, tuple[int, tuple[Course, ...]]] = field(default_factory=dict)
+    # Number of sequences after which each mission is doable
+    doable_counts: list[int] = field(default_factory=list)
+    doable_masks: dict[Attributes, int] = field(default_factory=dict)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.nb_chunks_done == self.nb_chunks
+
+    def iter_doable_missions(self, attr: Attributes):
+        return iter_missions_in_mask(self.missions, self.doable_masks[attr])
+
+    def iter_rows(self):
+        """Yields `(program, nb_sequences, doable_missions)` for each training
+        state reached, with the first program that gets there, in the order
+        of those programs."""
+        rows = sorted(self.reached.items(), key=lambda item: [c.value for c in item[1][1]])
+        for attr, (nb_sequences, courses) in rows:
+            program = TrainingProgram(courses, self.initial_attr, self.max_aggregate)
+            yield program, nb_sequences, list(self.iter_doable_missions(attr))
+
+
+class SweepCancelled(Exception):
+    pass
+
+
+# Read-only data of a worker process, set once by `_init_worker`
+_worker_table: Optional[TransitionTable] = None
+
+
+def _init_worker(max_aggregate: int) -> None:
+    global _worker_table
+    _worker_table = get_transition_table(max_aggregate)
+
+
+def _sweep_chunk(
+    prefix: tuple[int, ...],
+    state: int,
+    prefix_is_redundant: bool,
+    nb_courses_left: int,
+    skip_redundant: bool
+) -> ChunkSummary:
+    reached: dict[int, list] = dict()
+    nb_sequences = 0
+    nb_redundant = 0
+    for path, final_state, is_redundant in _worker_table.iter_paths(
+            state, nb_courses_left, skip_redundant):
+        nb_sequences += 1
+        if is_redundant or prefix_is_redundant:
+            nb_redundant += 1
+        entry = reached.get(final_state)
+        if entry is None:
+            reached[final_state] = [1, prefix + path]
+        else:
+            entry[0] += 1
+    return ChunkSummary(prefix, nb_sequences, nb_redundant,
+                        {state: (count, first) for state, (count, first) in reached.items()})
+
+
+class DeepSweep:
+    """Sweep of every program of `nb_courses` courses, from the squadron's
+    training attributes, split in chunks by prefix across `jobs` processes.
+
+    `run()` calls `progress(nb_chunks_done, nb_chunks)` after each chunk.
+    `cancel()` (from the progress callback, or another thread) stops the
+    sweep after the chunks in progress: `run()` then raises
+    `SweepCancelled`, or returns what was done with `partial=True`.
+
+    The chunk summaries are merged in prefix order, whatever order they
+    come back in, so the result doesn't depend on the number of workers.
+    """
+
+    def __init__(
+        self,
+        squadron: Squadron,
+        nb_courses: int,
+        jobs: Optional[int] = None,
+        prefix_length: Optional[int] = None,
+        skip_redundant: bool = True
+    ):
+        self.squadron = squadron
+        self.nb_courses = nb_courses
+        self.jobs = jobs if jobs is not None else (os.cpu_count() or 1)
+        if prefix_length is None:
+            # Enough chunks to keep every worker busy, and to report progress
+            prefix_length = 1
+            while prefix_length < nb_courses and len(Course) ** prefix_length < 16 * self.jobs:
+                prefix_length += 1
+        self.prefix_length = min(prefix_length, nb_courses)
+        self.skip_redundant = skip_redundant
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _merge(self, result: DeepSweepResult, summary: ChunkSummary, table: TransitionTable) -> None:
+        courses = list(Course)
+        result.nb_chunks_done += 1
+        result.nb_sequences += summary.nb_sequences
+        result.nb_redundant += summary.nb_redundant
+        for state_index, (count, first) in summary.reached.items():
+            attr = table.states[state_index]
+            known = result.reached.get(attr)
+            if known is None:
+                # Chunks are merged in prefix order: the first one wins.
+                result.reached[attr] = (count, tuple(courses[i] for i in first))
+            else:
+                result.reached[attr] = (known[0] + count, known[1])
+
+    def run(
+        self,
+        progress: Optional[Callable[[int, int], None]] = None,
+        partial: bool = False
+    ) -> DeepSweepResult:
+        squadron = self.squadron
+        table = get_transition_table(squadron.max_training_attr)
+        initial_index = table.index_of.get(squadron.training_attr)
+        if initial_index is None:
+            raise ValueError(f"{squadron.training_attr} is not a training state")
+        unlock_map = build_unlock_map(squadron)
+
+        chunks = list(table.iter_paths(initial_index, self.prefix_length, self.skip_redundant))
+        nb_courses_left = self.nb_courses - self.prefix_length
+        result = DeepSweepResult(squadron.training_attr, squadron.max_training_attr,
+                                 self.nb_courses, unlock_map.missions, len(chunks))
+        summaries: list[Optional[ChunkSummary]] = [None] * len(chunks)
+
+        if self.jobs == 1:
+            _init_worker(squadron.max_training_attr)
+            for position, (prefix, state, is_redundant) in enumerate(chunks):
+                if self._cancelled.is_set():
+                    break
+                summaries[position] = _sweep_chunk(
+                    prefix, state, is_redundant, nb_courses_left, self.skip_redundant)
+                if progress is not None:
+                    progress(position + 1, len(chunks))
+        else:
+            with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                     initargs=(squadron.max_training_attr,)) as pool:
+                in_flight: dict[Future, int] = dict()
+                next_chunk = 0
+                nb_done = 0
+                while next_chunk < len(chunks) or in_flight:
+                    while (next_chunk < len(chunks) and len(in_flight) < 2 * self.jobs
+                           and not self._cancelled.is_set()):
+                        prefix, state, is_redundant = chunks[next_chunk]
+                        future = pool.submit(_sweep_chunk, prefix, state, is_redundant,
+                                             nb_courses_left, self.skip_redundant)
+                        in_flight[future] = next_chunk
+                        next_chunk += 1
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        summaries[in_flight.pop(future)] = future.result()
+                        nb_done += 1
+                        if progress is not None:
+                            progress(nb_done, len(chunks))
+
+        if self._cancelled.is_set() and not partial:
+            raise SweepCancelled(f"Cancelled after {sum(s is not None for s in summaries)} "
+                                 f"of {len(chunks)} chunks")
+
+        for summary in summaries:
+            if summary is not None:
+                self._merge(result, summary, table)
+
+        nb_missions = len(unlock_map.missions)
+        result.doable_counts = [0] * nb_missions
+        for attr, (count, _) in result.reached.items():
+            mask = unlock_map.doable_mask(attr)
+            result.doable_masks[attr] = mask
+            for position in range(nb_missions):
+                if mask >> position & 1:
+                    result.doable_counts[position] += count
+        return result
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from csvparser import load_squadron
+
+    parser = argparse.ArgumentParser(description="Sweep every program of many courses in parallel.")
+    parser.add_argument('export', help="Squadron-*.csv export")
+    parser.add_argument('--depth', type=int, default=6, help="number of courses (default: 6)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument('--include-redundant', action='store_true',
+                        help="also walk the programs with a useless course")
+    parser.add_argument('--min-missions', type=int, default=0,
+                        help="only show states with at least this many doable missions")
+    args = parser.parse_args(argv)
+
+    def show_progress(nb_done: int, nb_chunks: int) -> None:
+        print(f"\r{nb_done}/{nb_chunks} chunks", end='', file=sys.stderr, flush=True)
+
+    squadron = load_squadron(args.export)
+    sweep = DeepSweep(squadron, args.depth, args.jobs, skip_redundant=not args.include_redundant)
+    try:
+        result = sweep.run(show_progress)
+    except KeyboardInterrupt:
+        sweep.cancel()
+        raise
+    print(file=sys.stderr)
+
+    print(f"{result.nb_sequences} sequences ({result.nb_redundant} redundant), "
+          f"{len(result.reached)} training states")
+    for mission, count in zip(result.missions, result.doable_counts):
+        print(f"{count:9}\t{mission}")
+    print()
+    for program, nb_sequences, doable_missions in result.iter_rows():
+        if len(doable_missions) < args.min_missions:
+            continue
+        print(f"{program}    x{nb_sequences}")
+        print(*doable_missions, sep='\n')
+        print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+"""Fleet mode: runs the analysis of many squadron exports across a pool of
+processes, and streams the results to a JSONL file.
+
+    python fleet.py exports/ -o results.jsonl
+    python fleet.py manifest.txt -o results.jsonl --jobs 8
+
+The input is either a directory of `Squadron-*.csv` files, or a manifest
+listing one export path per line. The results are written in the same
+order as the input files, one JSON object per file.
+"""
+import argparse
+import glob
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+from csvparser import load_squadron
+from feasibility import sweep
+
+
+def list_exports(path: str, pattern: str = 'Squadron-*.csv') -> list[str]:
+    """Export files of a directory (sorted), or listed in a manifest file.
+    In a manifest, empty lines and lines starting with '#' are ignored,
+    and relative paths are relative to the manifest."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, pattern)))
+
+    base_dir = os.path.dirname(path)
+    with open(path) as manifest:
+        lines = [line.strip() for line in manifest]
+    return [os.path.join(base_dir, line) for line in lines
+            if line != '' and not line.startswith('#')]
+
+
+def attr_as_list(attr) -> list[int]:
+    return [attr.phy, attr.men, attr.tac]
+
+
+def analyze_squadron(filename: str, max_courses: int = 3) -> dict:
+    """Doable missions and lowest squads of every non-redundant program of
+    0 to `max_courses` courses, as a JSON-friendly dict.
+
+    A file that can't be analyzed gives `{"file": ..., "error": ...}`
+    instead, so that one bad export doesn't stop the rest of the fleet."""
+    try:
+        return _analyze(filename, max_courses)
+    # Anything can go wrong with a file we know nothing about (eg: a bad
+    #   value that only fails when the squads are built).
+    except Exception as error:
+        return {"file": filename, "error": str(error)}
+
+
+def _analyze(filename: str, max_courses: int) -> dict:
+    squadron = load_squadron(filename)
+    programs = []
+    for nb_courses in range(max_courses + 1):
+        table = sweep(squadron, nb_courses)
+        for index, program in enumerate(table.programs):
+            if program.is_redundant:
+                continue
+            lowest_squads = {mission.name: squad.id
+                             for mission, squad in zip(table.missions, table.lowest[index])
+                             if squad is not None}
+            programs.append({
+                "courses": [course.name for course in program.courses],
+                "attr": attr_as_list(program.attr),
+                "doable_missions": list(lowest_squads),
+                "lowest_squads": lowest_squads,
+            })
+
+    return {
+        "file": filename,
+        "training_attr": attr_as_list(squadron.training_attr),
+        "max_training_attr": squadron.max_training_attr,
+        "programs": programs,
+    }
+
+
+def _analyze_chunk(filenames: list[str], max_courses: int) -> list[dict]:
+    return [analyze_squadron(filename, max_courses) for filename in filenames]
+
+
+def iter_fleet_results(
+    filenames: Iterable[str],
+    max_courses: int = 3,
+    jobs: Optional[int] = None,
+    chunk_size: int = 4,
+    max_chunks_in_flight: Optional[int] = None
+):
+    """Yields the analysis of every file, in the same order as `filenames`.
+
+    Files are sent to the workers in chunks, and at most
+    `max_chunks_in_flight` chunks are submitted at any time, so memory stays
+    bounded no matter how many files there are."""
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if max_chunks_in_flight is None:
+        max_chunks_in_flight = 2 * jobs
+
+    def iter_chunks():
+        chunk = []
+        for filename in filenames:
+            chunk.append(filename)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if len(chunk) > 0:
+            yield chunk
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        in_flight = deque()
+        for chunk in iter_chunks():
+            if len(in_flight) == max_chunks_in_flight:
+                yield from in_flight.popleft().result()
+            in_flight.append(pool.submit(_analyze_chunk, chunk, max_courses))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def run_fleet(
+    input_path: str,
+    output_path: str,
+    max_courses: int = 3,
+    jobs: Optional[int] = None,
+    chunk_size: int = 4
+) -> int:
+    """Writes one JSON line per export, as soon as it's ready (and in order).
+    Returns the number of exports written."""
+    nb_written = 0
+    with open(output_path, 'w') as output:
+        for result in iter_fleet_results(list_exports(input_path), max_courses, jobs, chunk_size):
+            output.write(json.dumps(result))
+            output.write('\n')
+            output.flush()
+            nb_written += 1
+    return nb_written
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Analyze many squadron exports in parallel.")
+    parser.add_argument('input', help="directory of Squadron-*.csv files, or manifest file")
+    parser.add_argument('-o', '--output', default='fleet.jsonl')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument('--chunk-size', type=int, default=4)
+    parser.add_argument('--max-courses', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    nb_written = run_fleet(args.input, args.output, args.max_courses, args.jobs, args.chunk_size)
+    print(f"{nb_written} squadrons written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from attributes import Attributes
+from typing import Iterable, Optional
+from squadronplanner import Mission, Squadron
+
+Gap = tuple[int, int, int]
+
+
+def pareto_minimal(gaps: Iterable[Gap]) -> list[Gap]:
+    """The gaps that no other gap beats (or ties) on all three attributes,
+    smallest sum first.
+
+        >>> pareto_minimal([(0, 20, 0), (10, 20, 0), (0, 0, 30), (0, 20, 0)])
+        [(0, 20, 0), (0, 0, 30)]
+    """
+    minimal: list[Gap] = []
+    # A gap can only be beaten by a gap with a smaller (or equal) sum,
+    #   and those are already in `minimal` when we get to it.
+    for gap in sorted(set(gaps), key=lambda gap: (sum(gap), gap)):
+        phy, men, tac = gap
+        if not any(m_phy <= phy and m_men <= men and m_tac <= tac
+                   for m_phy, m_men, m_tac in minimal):
+            minimal.append(gap)
+    return minimal
+
+
+class GapIndex:
+    """Feasibility the other way around: for each mission, the training
+    that each squad is missing (requirements - squad attributes, at least
+    0), reduced to the gaps that no other squad beats.
+
+    A training state makes a mission doable when it covers one of those
+    gaps, and there are only a handful of them per mission, whatever the
+    number of squads.
+
+    Like the squads, the index must be rebuilt when members or missions
+    change.
+    """
+
+    def __init__(self, squads: Iterable, missions: Iterable[Mission]):
+        missions = list(missions)
+        gaps_by_mission: dict[str, set[Gap]] = {mission.name: set() for mission in missions}
+        for squad in squads:
+            phy, men, tac = squad.attr.phy, squad.attr.men, squad.attr.tac
+            for mission in missions:
+                requirements = mission.requirements
+                gaps_by_mission[mission.name].add((max(requirements.phy - phy, 0),
+                                                   max(requirements.men - men, 0),
+                                                   max(requirements.tac - tac, 0)))
+        self.minimal_gaps: dict[str, list[Gap]] = {
+            name: pareto_minimal(gaps) for name, gaps in gaps_by_mission.items()}
+
+    @classmethod
+    def from_squadron(cls, squadron: Squadron, missions: Optional[Iterable[Mission]] = None) -> 'GapIndex':
+        """Index of the squadron's squads, for its available missions (or
+        `missions`)."""
+        squadron.build_squads()
+        squads = squadron.squads if len(squadron.squads) > 0 else squadron.iter_squads()
+        if missions is None:
+            missions = squadron.iter_available_missions()
+        return cls(squads, missions)
+
+    def is_doable(self, mission: Mission, training_attr: Attributes) -> bool:
+        phy, men, tac = training_attr.phy, training_attr.men, training_attr.tac
+        return any(g_phy <= phy and g_men <= men and g_tac <= tac
+                   for g_phy, g_men, g_tac in self.minimal_gaps[mission.name])
+
+    def iter_unlocking_states(self, mission: Mission, max_aggregate: int, step: int = 20):
+        """Every training state (see `transitions.iter_training_states`)
+        that makes the mission doable, in the same order, built from the
+        minimal gaps instead of testing every state."""
+        states: set[Attributes] = set()
+        for gap in self.minimal_gaps[mission.name]:
+            # The smallest state that covers the gap...
+            low_phy, low_men, low_tac = (-(-value // step) * step for value in gap)
+            room = max_aggregate - low_phy - low_men - low_tac
+            # ...plus anything that still fits.
+            for phy in range(low_phy, low_phy + room + 1, step):
+                for men in range(low_men, low_men + room - (phy - low_phy) + 1, step):
+                    left = room - (phy - low_phy) - (men - low_men)
+                    for tac in range(low_tac, low_tac + left + 1, step):
+                        states.add(Attributes(phy, men, tac))
+        return iter(sorted(states))
@@ -0,0 +1,189 @@
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+from attributes import Attributes
+from csvparser import load_squadron
+from typing import Optional
+from transitions import DEFAULT_CACHE_DIR
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    date TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    training_phy INTEGER NOT NULL,
+    training_men INTEGER NOT NULL,
+    training_tac INTEGER NOT NULL,
+    max_training_attr INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    date TEXT NOT NULL,
+    member_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    job TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    phy INTEGER NOT NULL,
+    men INTEGER NOT NULL,
+    tac INTEGER NOT NULL,
+    PRIMARY KEY (date, member_id)
+);
+CREATE INDEX IF NOT EXISTS members_by_name ON members (name, date);
+CREATE TABLE IF NOT EXISTS missions (
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp_reward INTEGER NOT NULL,
+    phy INTEGER NOT NULL,
+    men INTEGER NOT NULL,
+    tac INTEGER NOT NULL,
+    is_available INTEGER NOT NULL,
+    -- Available, and cleared by a squad with the training attributes
+    --   of that day and no courses (lowest_squad is that squad)
+    is_doable INTEGER NOT NULL,
+    lowest_squad TEXT,
+    PRIMARY KEY (date, name)
+);
+CREATE INDEX IF NOT EXISTS missions_by_name ON missions (name, date);
+"""
+
+# Stored as the `user_version` of the SQLite file. Stores from before the
+#   versioning have none (0) and are version 1.
+SCHEMA_VERSION = 2
+# The script that upgrades a store from each version to the next one
+_MIGRATIONS = {
+    # is_doable didn't take availability into account
+    1: "UPDATE missions SET is_doable = 0 WHERE NOT is_available;",
+}
+
+_DATE_IN_FILENAME = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def date_from_filename(filename: str) -> str:
+    """ "Squadron-2021-09-24.csv" -> "2021-09-24" """
+    match = _DATE_IN_FILENAME.search(os.path.basename(filename))
+    if match is None:
+        raise ValueError(f"No YYYY-MM-DD date in the name of {filename}")
+    return match.group(1)
+
+
+class SnapshotHistory:
+    """Every daily export, ingested once into a local SQLite file, so that
+    questions about how things changed over time don't need to read the
+    CSV files again.
+
+    Snapshots are append-only: ingesting the same day twice does nothing,
+    unless the file changed, which is an error.
+    """
+
+    def __init__(self, path: str = os.path.join(DEFAULT_CACHE_DIR, 'history.sqlite3')):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self._upgrade()
+
+    def _upgrade(self) -> None:
+        """Creates the tables of a new store, or brings an older one up to
+        `SCHEMA_VERSION`."""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            is_new = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'snapshots'"
+            ).fetchone() is None
+            version = SCHEMA_VERSION if is_new else 1
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"History store of version {version}, "
+                             f"newer than this version ({SCHEMA_VERSION})")
+        # One script, so that a store is either upgraded or left as it was
+        migrations = "".join(_MIGRATIONS[from_version]
+                             for from_version in range(version, SCHEMA_VERSION))
+        self.connection.executescript(
+            f"BEGIN; {_SCHEMA} {migrations} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def ingest(self, filename: str, date: Optional[str] = None) -> bool:
+        """Adds a snapshot. Returns False if that day was already there."""
+        if date is None:
+            date = date_from_filename(filename)
+        with open(filename, 'rb') as file:
+            sha256 = hashlib.sha256(file.read()).hexdigest()
+
+        known = self.connection.execute(
+            "SELECT sha256 FROM snapshots WHERE date = ?", (date,)).fetchone()
+        if known is not None:
+            if known[0] != sha256:
+                raise ValueError(f"The snapshot of {date} was already ingested "
+                                 f"from a different file than {filename}")
+            return False
+
+        squadron = load_squadron(filename)
+        training = squadron.training_attr
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (date, os.path.basename(filename), sha256,
+                 training.phy, training.men, training.tac, squadron.max_training_attr))
+            self.connection.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(date, member.id, member.name, member.job, member.level,
+                  member.attr.phy, member.attr.men, member.attr.tac)
+                 for member in squadron.members])
+
+            mission_rows = []
+            for mission in squadron.missions:
+                squad = squadron.find_lowest_qualifying_squad(mission, training)
+                mission_rows.append(
+                    (date, mission.name, mission.level, mission.xp_reward,
+                     mission.requirements.phy, mission.requirements.men, mission.requirements.tac,
+                     mission.is_available, mission.is_available and squad is not None,
+                     None if squad is None else squad.id))
+            self.connection.executemany(
+                "INSERT INTO missions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                mission_rows)
+        return True
+
+    def ingest_directory(self, directory: str = '.', pattern: str = 'Squadron-*.csv') -> int:
+        """Ingests every export of a directory. Returns the number of new
+        snapshots."""
+        filenames = sorted(glob.glob(os.path.join(directory, pattern)))
+        return sum(self.ingest(filename) for filename in filenames)
+
+    def dates(self) -> list[str]:
+        rows = self.connection.execute("SELECT date FROM snapshots ORDER BY date")
+        return [date for (date,) in rows]
+
+    def training_history(self) -> list[tuple[str, Attributes, int]]:
+        """(date, training attributes, max training attributes), by date."""
+        rows = self.connection.execute(
+            "SELECT date, training_phy, training_men, training_tac, max_training_attr "
+            "FROM snapshots ORDER BY date")
+        return [(date, Attributes(phy, men, tac), max_attr)
+                for date, phy, men, tac, max_attr in rows]
+
+    def member_history(self, name: str) -> list[tuple[str, Attributes, int]]:
+        """(date, attributes, level) of a member, by date."""
+        rows = self.connection.execute(
+            "SELECT date, phy, men, tac, level FROM members WHERE name = ? ORDER BY date",
+            (name,))
+        return [(date, Attributes(phy, men, tac), level)
+                for date, phy, men, tac, level in rows]
+
+    def mission_history(self, name: str) -> list[tuple[str, bool, bool, Optional[str]]]:
+        """(date, is available, is doable, lowest squad) of a mission, by date."""
+        rows = self.connection.execute(
+            "SELECT date, is_available, is_doable, lowest_squad FROM missions "
+            "WHERE name = ? ORDER BY date",
+            (name,))
+        return [(date, bool(is_available), bool(is_doable), lowest_squad)
+                for date, is_available, is_doable, lowest_squad in rows]
+
+    def first_doable_dates(self) -> dict[str, Optional[str]]:
+        """The first day each mission was doable without training courses
+        (None if it never was)."""
+        rows = self.connection.execute(
+            "SELECT name, MIN(CASE WHEN is_doable THEN date END) FROM missions "
+            "GROUP BY name ORDER BY MIN(level), name")
+        return dict(rows.fetchall())
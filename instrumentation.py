@@ -0,0 +1,90 @@
+"""Opt-in counters and timers for the planner's hot paths.
+
+Everything is off by default, and the instrumented code only checks
+`instrumentation.enabled` before counting anything, so the cost is a single
+attribute lookup when disabled.
+
+    import instrumentation
+    instrumentation.enable()
+    ...  # run the planner
+    instrumentation.write_json("profile.json")
+    instrumentation.write_collapsed("profile.folded")  # for flamegraph.pl / speedscope
+"""
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+enabled = False
+
+counters: Counter = Counter()
+# Phase stack (as "outer;inner") -> [nb calls, total seconds, seconds in sub-phases]
+phases: dict[str, list] = dict()
+_phase_stack: list[str] = []
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    counters.clear()
+    phases.clear()
+    _phase_stack.clear()
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Callers should check `enabled` first, to stay free when disabled."""
+    counters[name] += amount
+
+
+@contextmanager
+def phase(name: str):
+    """Times a phase of the work. Phases can be nested."""
+    if not enabled:
+        yield
+        return
+
+    _phase_stack.append(name)
+    stack = ";".join(_phase_stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _phase_stack.pop()
+        stats = phases.setdefault(stack, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        if len(_phase_stack) > 0:
+            parent = phases.setdefault(";".join(_phase_stack), [0, 0.0, 0.0])
+            parent[2] += elapsed
+
+
+def report() -> dict:
+    return {
+        "counters": dict(sorted(counters.items())),
+        "phases": {
+            stack: {"calls": calls, "seconds": seconds, "self_seconds": seconds - child_seconds}
+            for stack, (calls, seconds, child_seconds) in sorted(phases.items())
+        },
+    }
+
+
+def write_json(path: str) -> None:
+    with open(path, 'w') as output:
+        json.dump(report(), output, indent=2)
+
+
+def write_collapsed(path: str) -> None:
+    """Phases in the "collapsed stacks" format of flame graph tools:
+    one line per stack, with its own time in microseconds."""
+    with open(path, 'w') as output:
+        for stack, (_, seconds, child_seconds) in sorted(phases.items()):
+            output.write(f"{stack} {round((seconds - child_seconds) * 1_000_000)}\n")
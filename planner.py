@@ -0,0 +1,132 @@
+import instrumentation
+from attributes import Attributes
+from dataclasses import dataclass
+from typing import Optional, Union
+from squadronplanner import Mission, Squad, Squadron, TrainingProgram
+from statesearch import StateSearch
+
+
+@dataclass
+class DayPlan:
+    day: int
+    program: TrainingProgram
+    mission: Optional[Mission]
+    squad: Optional[Squad]
+
+    def __str__(self):
+        return f"Day {self.day}    {self.squad} {self.mission} {self.program}"
+
+
+@dataclass
+class Plan:
+    days: list[DayPlan]
+    total_xp: int
+
+    def __str__(self):
+        lines = [str(day_plan) for day_plan in self.days]
+        lines.append(f"Total XP: {self.total_xp}")
+        return "\n".join(lines)
+
+
+class MultiDayPlanner:
+    """Plans the training programs and missions of the next `nb_days` days,
+    to get the most mission XP over the whole horizon.
+
+    Each day, we take at most that day's number of courses, then we do the
+    available mission with the best `xp_reward` that one of our squads can
+    clear. The training state carries over to the next day.
+
+    The best plan from a given day only depends on the training state at the
+    start of that day, so the results are memoized on (day, training state).
+    There are only a few hundred training states, so a week is instant.
+    """
+
+    def __init__(
+        self,
+        squadron: Squadron,
+        nb_days: int,
+        courses_per_day: Union[int, list[int], None] = None
+    ):
+        """`courses_per_day` is either the same budget for every day, or one
+        budget per day. By default, today uses the squadron's
+        `remaining_daily_courses`, and the other days get 3 courses."""
+        if courses_per_day is None:
+            courses_per_day = [squadron.remaining_daily_courses] + [3] * (nb_days - 1)
+        elif isinstance(courses_per_day, int):
+            courses_per_day = [courses_per_day] * nb_days
+        if len(courses_per_day) != nb_days:
+            raise ValueError(f"Expected {nb_days} daily course budgets, "
+                             f"got {len(courses_per_day)}")
+
+        self.squadron = squadron
+        self.nb_days = nb_days
+        self.courses_per_day = courses_per_day
+
+        self._searches: dict[Attributes, StateSearch] = dict()
+        self._best_missions: dict[Attributes, tuple[int, Optional[Mission], Optional[Squad]]] = dict()
+        # (day, training state) -> (XP from that day onward, state chosen for that day)
+        self._memo: dict[tuple[int, Attributes], tuple[int, Optional[Attributes]]] = dict()
+
+    def _search_from(self, attr: Attributes) -> StateSearch:
+        search = self._searches.get(attr)
+        if search is None:
+            search = StateSearch(attr, self.squadron.max_training_attr)
+            self._searches[attr] = search
+        return search
+
+    def best_mission(self, attr: Attributes) -> tuple[int, Optional[Mission], Optional[Squad]]:
+        """(xp, mission, squad) of the most rewarding doable mission with
+        the training attributes `attr`. (0, None, None) if none are doable."""
+        best = self._best_missions.get(attr)
+        if best is not None:
+            return best
+
+        best = (0, None, None)
+        for mission in self.squadron.iter_available_missions():
+            if mission.xp_reward <= best[0]:
+                continue
+            squad = self.squadron.find_lowest_qualifying_squad(mission, attr)
+            if squad is not None:
+                best = (mission.xp_reward, mission, squad)
+        self._best_missions[attr] = best
+        return best
+
+    def _best_from(self, day: int, attr: Attributes) -> tuple[int, Optional[Attributes]]:
+        if day == self.nb_days:
+            return 0, None
+
+        key = (day, attr)
+        result = self._memo.get(key)
+        if result is not None:
+            if instrumentation.enabled:
+                instrumentation.count("planner.memo_hits")
+            return result
+
+        best_xp = -1
+        best_state = None
+        # States come by increasing number of courses, so on equal XP,
+        #   we keep the cheapest training.
+        for reachable in self._search_from(attr).iter_states(self.courses_per_day[day]):
+            xp_today = self.best_mission(reachable.attr)[0]
+            xp_later = self._best_from(day + 1, reachable.attr)[0]
+            if xp_today + xp_later > best_xp:
+                best_xp = xp_today + xp_later
+                best_state = reachable.attr
+
+        result = (best_xp, best_state)
+        self._memo[key] = result
+        return result
+
+    def plan(self) -> Plan:
+        self.squadron.build_squads()
+        total_xp, _ = self._best_from(0, self.squadron.training_attr)
+
+        days = []
+        attr = self.squadron.training_attr
+        for day in range(self.nb_days):
+            _, next_attr = self._best_from(day, attr)
+            program = self._search_from(attr).shortest_program(next_attr)
+            _, mission, squad = self.best_mission(next_attr)
+            days.append(DayPlan(day, program, mission, squad))
+            attr = next_attr
+        return Plan(days, total_xp)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import zlib
+from feasibility import FeasibilityTable, sweep
+from typing import Optional
+from courserules import DEFAULT_RULES
+from squadronplanner import RULES_VERSION, Squadron
+from transitions import DEFAULT_CACHE_DIR
+
+# Bump this when the format of the cached results changes.
+CACHE_FORMAT_VERSION = 2
+
+
+def input_key(squadron: Squadron, max_courses: int, kind: str = "sweeps") -> str:
+    """Hash of everything the results depend on. `kind` tells apart the
+    results of the same inputs: all the sweeps up to `max_courses`
+    ("sweeps") or only the last one ("sweep").
+
+    The inputs are normalized first (members by id, missions by name), so
+    reordering the rows of an export doesn't change the key."""
+    members = sorted(
+        (member.id, member.name, member.attr.phy, member.attr.men, member.attr.tac)
+        for member in squadron.members)
+    missions = sorted(
+        (mission.name, mission.requirements.phy, mission.requirements.men,
+         mission.requirements.tac, mission.level, mission.xp_reward, mission.is_available)
+        for mission in squadron.missions)
+    normalized = {
+        "members": members,
+        "missions": missions,
+        "training_attr": [squadron.training_attr.phy, squadron.training_attr.men, squadron.training_attr.tac],
+        "max_training_attr": squadron.max_training_attr,
+        "squad_size": squadron.squad_size,
+        "max_courses": max_courses,
+        "kind": kind,
+        "rules_version": RULES_VERSION,
+        "rules_fingerprint": DEFAULT_RULES.fingerprint(),
+        "cache_format_version": CACHE_FORMAT_VERSION,
+    }
+    as_bytes = json.dumps(normalized, sort_keys=True).encode()
+    return hashlib.sha256(as_bytes).hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of results, by input key.
+
+    Each entry is a single compressed pickle. Reading an entry touches its
+    modification time, and the least recently used entries are removed
+    whenever the cache grows past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        directory: str = os.path.join(DEFAULT_CACHE_DIR, 'results'),
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def get(self, key: str):
+        """The cached object, or None (also when the cache can't be read)."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        try:
+            value = pickle.loads(zlib.decompress(data))
+        except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Corrupted, or written by an older version of the code
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value) -> bool:
+        """Best effort: returns False if the entry could not be written
+        (eg: read-only cache directory)."""
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        path = self._path(key)
+        # The service writes from executor threads, so the pid isn't enough
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Removes the least recently used entries, until the cache fits
+        in `max_bytes`."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.bin'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.bin'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def cached_sweeps(
+    squadron: Squadron,
+    max_courses: int,
+    cache: Optional[ResultCache] = None
+) -> list[FeasibilityTable]:
+    """Feasibility tables of 0 to `max_courses` courses (one per number of
+    courses), straight from the cache when the inputs didn't change.
+
+    The cache only saves time: if it can't be read or written, the tables
+    are computed all the same."""
+    if cache is None:
+        cache = ResultCache()
+    key = input_key(squadron, max_courses)
+    tables = cache.get(key)
+    if tables is None:
+        tables = [sweep(squadron, nb_courses) for nb_courses in range(max_courses + 1)]
+        cache.put(key, tables)
+    return tables
+
+
+def cached_sweep(
+    squadron: Squadron,
+    nb_courses: int,
+    cache: Optional[ResultCache] = None
+) -> FeasibilityTable:
+    """The feasibility table of `nb_courses` courses alone, like
+    `cached_sweeps(squadron, nb_courses)[nb_courses]` without computing
+    (and storing) the shorter ones."""
+    if cache is None:
+        cache = ResultCache()
+    key = input_key(squadron, nb_courses, kind="sweep")
+    table = cache.get(key)
+    if table is None:
+        table = sweep(squadron, nb_courses)
+        cache.put(key, table)
+    return table
@@ -0,0 +1,320 @@
+"""Results as streams of flat records, and sinks that write them to disk.
+
+    with open_sink('sweep-3.jsonl') as sink:
+        write_records(iter_sweep_records(squadron, 3), sink)
+
+Every record is a dict of plain values (int, str, bool or None), with
+the same keys for all the records of a stream, so the three formats
+(JSONL, CSV, and a compact binary format) can write any of them. Records
+are produced one at a time and the sinks write them in buffered batches,
+so even the biggest sweeps stream to disk in constant memory.
+"""
+import csv
+import io
+import json
+import os
+import struct
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, Optional, Union
+from feasibility import iter_programs
+from squadronplanner import Course, Squadron, TrainingProgram
+
+Value = Union[int, str, bool, None]
+Record = dict[str, Value]
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def _program_fields(program: TrainingProgram) -> Record:
+    return {
+        "courses": ",".join(course.name for course in program.courses),
+        "phy": program.attr.phy,
+        "men": program.attr.men,
+        "tac": program.attr.tac,
+        "is_redundant": program.is_redundant,
+    }
+
+
+def iter_doable_records(squadron: Squadron, program: TrainingProgram) -> Iterator[Record]:
+    """One record per doable mission with the program."""
+    fields = _program_fields(program)
+    for mission in squadron.iter_doable_missions_with_program(program):
+        yield {**fields, "mission": mission.name, "level": mission.level,
+               "xp_reward": mission.xp_reward}
+
+
+def iter_lowest_squad_records(squadron: Squadron, program: TrainingProgram) -> Iterator[Record]:
+    """One record per doable mission with the program, with its lowest squad."""
+    fields = _program_fields(program)
+    for mission in squadron.iter_available_missions():
+        squad = squadron.find_lowest_qualifying_squad(mission, program.attr)
+        if squad is None:
+            continue
+        yield {**fields, "mission": mission.name, "level": mission.level,
+               "xp_reward": mission.xp_reward, "squad": squad.id, "aggregate": squad.aggregate}
+
+
+def iter_sweep_records(
+    squadron: Squadron,
+    nb_courses: int,
+    skip_redundant: bool = False,
+    min_missions: int = 0
+) -> Iterator[Record]:
+    """The lowest squad records of every program of `nb_courses` courses
+    with at least `min_missions` doable missions, program after program:
+    nothing is kept in memory but the records of the current program (and
+    the squadron's lowest squad cache). Programs with no doable missions
+    have no records."""
+    for program in iter_programs(nb_courses, squadron.training_attr,
+                                 squadron.max_training_attr, skip_redundant):
+        records = list(iter_lowest_squad_records(squadron, program))
+        if len(records) >= min_missions:
+            yield from records
+
+
+class Sink(ABC):
+    """Writes records to a file, in batches of about `buffer_size` bytes."""
+    binary = False
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, 'wb' if self.binary else 'w',
+                         **({} if self.binary else {'newline': '', 'encoding': 'utf-8'}))
+        self.buffer: list = []
+        self.empty = b'' if self.binary else ''
+        self.buffered_size = 0
+        self.nb_records = 0
+
+    @abstractmethod
+    def encode(self, record: Record):
+        """One record, as text (or bytes if `binary`)."""
+
+    def write(self, record: Record) -> None:
+        chunk = self.encode(record)
+        self.buffer.append(chunk)
+        self.buffered_size += len(chunk)
+        self.nb_records += 1
+        if self.buffered_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.file.write(self.empty.join(self.buffer))
+            self.buffer = []
+            self.buffered_size = 0
+        self.file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonlSink(Sink):
+    def encode(self, record: Record) -> str:
+        return json.dumps(record) + '\n'
+
+
+class CsvSink(Sink):
+    """The header comes from the keys of the first record."""
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__(path, buffer_size)
+        self.fieldnames: Optional[list[str]] = None
+        self.line = io.StringIO()
+        self.writer = csv.writer(self.line)
+
+    def encode(self, record: Record) -> str:
+        self.line.seek(0)
+        self.line.truncate()
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+            self.writer.writerow(self.fieldnames)
+        self.writer.writerow(record[name] for name in self.fieldnames)
+        return self.line.getvalue()
+
+
+# Binary layout:
+#   header:  magic, format version, length of the field names, field names (JSON)
+#   records: one tagged value per field, in the order of the field names
+# The first `MAX_INTERNED_STRINGS` distinct strings are written once, and
+#   then referred to by their number; the strings after them are written
+#   in full every time, so that neither side keeps an ever-growing table.
+# Every program has its own "courses", so they are not strings at all but
+#   one byte per course (its index), which is also 3 to 4 times smaller.
+_MAGIC = b'SQRS'
+_BINARY_VERSION = 2
+_HEADER = struct.Struct('<4sBI')
+_NONE, _INT, _STRING_REF, _NEW_STRING, _FALSE, _TRUE, _SMALL_INT, _STRING, _COURSES = range(9)
+MAX_INTERNED_STRINGS = 4096
+_COURSES_FIELD = "courses"
+_COURSE_NAMES = [course.name for course in Course]
+_COURSE_INDEXES = {name: index for index, name in enumerate(_COURSE_NAMES)}
+_TAG = struct.Struct('<B')
+_TAGGED_INT = struct.Struct('<Bq')
+_TAGGED_SMALL_INT = struct.Struct('<Bh')
+_TAGGED_STRING_REF = struct.Struct('<BI')
+_TAGGED_NEW_STRING = struct.Struct('<BH')
+_TAGGED_STRING = struct.Struct('<BH')
+_TAGGED_COURSES = struct.Struct('<BB')
+
+
+class BinarySink(Sink):
+    """Records in the binary layout above, read back by `read_binary`.
+
+        >>> import os, tempfile
+        >>> records = [
+        ...     {"courses": "PHY,MEN", "phy": 40, "is_redundant": False, "squad": None, "xp": 2 ** 40},
+        ...     {"courses": "MEN_TAC", "phy": -20, "is_redundant": True, "squad": "1234", "xp": 0},
+        ...     {"courses": "", "phy": 0x7fff, "is_redundant": False, "squad": "1234", "xp": -2 ** 40},
+        ...     {"courses": "NOT,A,COURSE", "phy": 0, "is_redundant": False, "squad": "5678", "xp": 1},
+        ...     {"courses": "PHY,MEN", "phy": 0, "is_redundant": False, "squad": "5678", "xp": 1},
+        ... ]
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     path = os.path.join(directory, 'records.bin')
+        ...     with BinarySink(path, buffer_size=16, max_interned_strings=1) as sink:
+        ...         write_records(records, sink)
+        ...     print(sorted(sink.string_ids))
+        ...     list(read_binary(path)) == records
+        5
+        ['1234']
+        True
+    """
+    binary = True
+
+    def __init__(
+        self,
+        path: str,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        max_interned_strings: int = MAX_INTERNED_STRINGS
+    ):
+        super().__init__(path, buffer_size)
+        self.fieldnames: Optional[list[str]] = None
+        self.string_ids: dict[str, int] = dict()
+        self.max_interned_strings = max_interned_strings
+
+    @staticmethod
+    def _course_indexes(value: str) -> Optional[bytes]:
+        """ "PHY_MEN,PHY" -> bytes([3, 0]), or None if not only courses."""
+        if value == '':
+            return b''
+        indexes = [_COURSE_INDEXES.get(name) for name in value.split(',')]
+        if None in indexes or len(indexes) > 0xff:
+            return None
+        return bytes(indexes)
+
+    def encode(self, record: Record) -> bytes:
+        parts = []
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+            names = json.dumps(self.fieldnames).encode()
+            parts.append(_HEADER.pack(_MAGIC, _BINARY_VERSION, len(names)))
+            parts.append(names)
+        for name in self.fieldnames:
+            value = record[name]
+            if value is None:
+                parts.append(_TAG.pack(_NONE))
+            elif value is True or value is False:
+                parts.append(_TAG.pack(_TRUE if value else _FALSE))
+            elif isinstance(value, int):
+                # Attributes, levels and XP rewards all fit in 2 bytes
+                if -0x8000 <= value < 0x8000:
+                    parts.append(_TAGGED_SMALL_INT.pack(_SMALL_INT, value))
+                else:
+                    parts.append(_TAGGED_INT.pack(_INT, value))
+            else:
+                if name == _COURSES_FIELD:
+                    indexes = self._course_indexes(value)
+                    if indexes is not None:
+                        parts.append(_TAGGED_COURSES.pack(_COURSES, len(indexes)))
+                        parts.append(indexes)
+                        continue
+                string_id = self.string_ids.get(value)
+                if string_id is not None:
+                    parts.append(_TAGGED_STRING_REF.pack(_STRING_REF, string_id))
+                    continue
+                as_bytes = value.encode()
+                if len(self.string_ids) < self.max_interned_strings:
+                    self.string_ids[value] = len(self.string_ids)
+                    parts.append(_TAGGED_NEW_STRING.pack(_NEW_STRING, len(as_bytes)))
+                else:
+                    parts.append(_TAGGED_STRING.pack(_STRING, len(as_bytes)))
+                parts.append(as_bytes)
+        return b''.join(parts)
+
+
+def read_binary(path: str) -> Iterator[Record]:
+    """The records of a file written by `BinarySink`, one at a time."""
+    with open(path, 'rb') as file:
+        header = file.read(_HEADER.size)
+        if len(header) == 0:
+            return
+        magic, version, names_length = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _BINARY_VERSION:
+            raise ValueError(f"{path} is not a result file (version {_BINARY_VERSION})")
+        fieldnames = json.loads(file.read(names_length))
+
+        strings: list[str] = []
+        while True:
+            tag_byte = file.read(1)
+            if len(tag_byte) == 0:
+                return
+            record = dict()
+            for position, name in enumerate(fieldnames):
+                if position > 0:
+                    tag_byte = file.read(1)
+                tag = tag_byte[0]
+                if tag == _SMALL_INT:
+                    record[name] = struct.unpack('<h', file.read(2))[0]
+                elif tag == _INT:
+                    record[name] = struct.unpack('<q', file.read(8))[0]
+                elif tag == _STRING_REF:
+                    record[name] = strings[struct.unpack('<I', file.read(4))[0]]
+                elif tag == _COURSES:
+                    indexes = file.read(file.read(1)[0])
+                    record[name] = ",".join(_COURSE_NAMES[index] for index in indexes)
+                elif tag == _NEW_STRING:
+                    length = struct.unpack('<H', file.read(2))[0]
+                    value = file.read(length).decode()
+                    strings.append(value)
+                    record[name] = value
+                elif tag == _STRING:
+                    length = struct.unpack('<H', file.read(2))[0]
+                    record[name] = file.read(length).decode()
+                else:
+                    record[name] = {_NONE: None, _FALSE: False, _TRUE: True}[tag]
+            yield record
+
+
+SINKS = {'jsonl': JsonlSink, 'csv': CsvSink, 'bin': BinarySink}
+
+
+def sink_format(path: str, format: Optional[str] = None) -> str:
+    """`format` if specified, or guessed from the file extension. Raises
+    ValueError if it is not one of `SINKS`."""
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in SINKS:
+        raise ValueError(f"Unknown result format {format!r} for {path} "
+                         f"(expected: {', '.join(SINKS)})")
+    return format
+
+
+def open_sink(path: str, format: Optional[str] = None, buffer_size: int = DEFAULT_BUFFER_SIZE) -> Sink:
+    """`format` is one of `SINKS`, or guessed from the file extension."""
+    return SINKS[sink_format(path, format)](path, buffer_size)
+
+
+def write_records(records: Iterable[Record], sink: Sink) -> int:
+    """Writes every record to the sink. Returns the number of records."""
+    nb_records = 0
+    for record in records:
+        sink.write(record)
+        nb_records += 1
+    return nb_records
@@ -0,0 +1,254 @@
+from attributes import Attributes
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from squadranking import MEMBER_LEVEL_CAP
+from squadronplanner import Member, Mission, Squad, Squadron
+
+
+@dataclass
+class MemberProgress:
+    member: Member
+    level: int
+    # XP into the current level (or XP gained so far, without an XP table)
+    xp: int = 0
+    total_xp: int = 0
+
+    def __str__(self):
+        return f"Lv. {self.level:2} (+{self.total_xp:6} XP)    {self.member.name}"
+
+
+@dataclass
+class Assignment:
+    mission: Mission
+    squad: Squad
+    # XP that went to members still below their target level
+    useful_xp: int
+
+    def __str__(self):
+        return f"{self.squad.id:11} {self.mission} (+{self.useful_xp} XP)"
+
+
+@dataclass
+class DayRotation:
+    day: int
+    assignments: list[Assignment] = field(default_factory=list)
+
+    def __str__(self):
+        if len(self.assignments) == 0:
+            return f"Day {self.day}    nothing to do"
+        return "\n".join(f"Day {self.day}    {assignment}" for assignment in self.assignments)
+
+
+@dataclass
+class RotationPlan:
+    days: list[DayRotation]
+    progress: list[MemberProgress]
+
+    def __str__(self):
+        lines = [str(day) for day in self.days]
+        lines.append("Members at the end:")
+        lines.extend(str(progress) for progress in self.progress)
+        return "\n".join(lines)
+
+
+class RotationScheduler:
+    """Plans which squad does which mission, every day of the next
+    `nb_days` days, so that the XP goes around the whole roster instead of
+    always going to the same lowest-aggregate squad.
+
+    Every day, the missions are handed out by decreasing XP: each goes to
+    the qualifying squad that ranks first on:
+      1. the squad members that are the least far along (see below),
+      2. the lowest sum of the levels of the squad members,
+      3. the lowest aggregate, like `find_lowest_qualifying_squad`.
+    So the best missions go around the roster, instead of always going to
+    the strongest squad, which is the one that qualifies the most often.
+    With `balance=False`, we keep the pair (mission, qualifying squad) with
+    the most XP going to members below their target level (members at
+    their target, or at the level cap, don't count), and the roster is only
+    balanced between squads that get the same XP.
+    A member does at most one mission a day, and a squad where nobody
+    needs XP doesn't go out.
+
+    The qualifying squads of each mission are found once, with the usual
+    packed feasibility check, since the attributes of the members don't
+    change during the plan: each day only scores those squads.
+
+    Without `xp_per_level` (XP needed to go from a level to the next), the
+    levels don't go up during the plan, and members are balanced by the XP
+    the plan gave them. With it, members level up as they get XP, and are
+    balanced by (fractional) level.
+    """
+
+    def __init__(
+        self,
+        squadron: Squadron,
+        nb_days: int,
+        missions_per_day: int = 1,
+        training_attr: Optional[Attributes] = None,
+        target_levels: Optional[dict[int, int]] = None,
+        xp_per_level: Optional[Callable[[int], int]] = None,
+        level_cap: int = MEMBER_LEVEL_CAP,
+        balance: bool = True
+    ):
+        """`target_levels` is by member ID. Members without a target level
+        aim for the level cap."""
+        if missions_per_day < 1:
+            raise ValueError(f"Expected at least 1 mission per day, got {missions_per_day}")
+        self.squadron = squadron
+        self.nb_days = nb_days
+        self.missions_per_day = missions_per_day
+        self.training_attr = squadron.training_attr if training_attr is None else training_attr
+        self.target_levels = dict() if target_levels is None else target_levels
+        self.xp_per_level = xp_per_level
+        self.level_cap = level_cap
+        self.balance = balance
+
+    def _target(self, member: Member) -> int:
+        return min(self.target_levels.get(member.id, self.level_cap), self.level_cap)
+
+    def _candidates(self) -> list[tuple[int, Squad, tuple[int, ...], list[Mission]]]:
+        """(position, squad, member IDs, missions) of every squad that can
+        do at least one available mission, with those missions, most XP
+        first.
+
+        For a given squad, the mission with the most XP always ranks first,
+        so each day only looks at one mission per squad, instead of every
+        (mission, squad) pair."""
+        self.squadron.build_squads()
+        if len(self.squadron.squads) > 0:
+            squads = self.squadron.squads
+        else:
+            squads = list(self.squadron.iter_squads())
+
+        missions = sorted(self.squadron.iter_available_missions(), key=lambda mission: -mission.xp_reward)
+        qualifying_ids = {
+            mission.name: {squad.id for squad in self.squadron.iter_qualifying_squads_for_mission(
+                mission, self.training_attr, squads)}
+            for mission in missions}
+
+        candidates = []
+        for position, squad in enumerate(squads):
+            squad_missions = [mission for mission in missions
+                              if squad.id in qualifying_ids[mission.name]]
+            if len(squad_missions) > 0:
+                ids = tuple(member.id for member in squad.members)
+                candidates.append((position, squad, ids, squad_missions))
+        return candidates
+
+    def _standing(self, progress: MemberProgress) -> float:
+        """How far along a member is: fractional level with an XP table,
+        XP gained during the plan without one."""
+        if self.xp_per_level is None:
+            return progress.total_xp
+        if progress.level >= self.level_cap:
+            return progress.level
+        return progress.level + progress.xp / self.xp_per_level(progress.level)
+
+    def _gain(self, progress: MemberProgress, xp: int) -> None:
+        if progress.level >= self.level_cap:
+            return
+        progress.xp += xp
+        progress.total_xp += xp
+        if self.xp_per_level is None:
+            return
+        while progress.level < self.level_cap and progress.xp >= self.xp_per_level(progress.level):
+            progress.xp -= self.xp_per_level(progress.level)
+            progress.level += 1
+        if progress.level >= self.level_cap:
+            progress.xp = 0
+
+    def plan(self) -> RotationPlan:
+        progress = {member.id: MemberProgress(member, member.level)
+                    for member in self.squadron.members}
+        targets = {member.id: self._target(member) for member in self.squadron.members}
+        candidates = self._candidates()
+        # Mission name -> its candidates, and the missions by decreasing XP
+        candidates_by_mission: dict[str, list] = dict()
+        for candidate in candidates:
+            for mission in candidate[3]:
+                candidates_by_mission.setdefault(mission.name, []).append(candidate)
+        missions = sorted({mission.name: mission for candidate in candidates
+                           for mission in candidate[3]}.values(),
+                          key=lambda mission: -mission.xp_reward)
+
+        days = []
+        for day in range(self.nb_days):
+            day_rotation = DayRotation(day)
+            busy: set[int] = set()
+            done: set[str] = set()
+            for _ in range(self.missions_per_day):
+                # Only depends on the members, not on the squads
+                standings = {id: self._standing(member_progress)
+                             for id, member_progress in progress.items()}
+                levels = {id: member_progress.level for id, member_progress in progress.items()}
+                is_learning = {id: id not in busy and levels[id] < targets[id] for id in progress}
+
+                if self.balance:
+                    best = self._least_advanced_pick(
+                        missions, candidates_by_mission, done, busy, is_learning, standings, levels)
+                else:
+                    best = self._most_xp_pick(candidates, done, busy, is_learning, standings, levels)
+                if best is None:
+                    # Nobody left to level up with the free members
+                    break
+
+                mission, squad, useful_xp = best
+                day_rotation.assignments.append(Assignment(mission, squad, useful_xp))
+                done.add(mission.name)
+                for member in squad.members:
+                    busy.add(member.id)
+                    if progress[member.id].level < targets[member.id]:
+                        self._gain(progress[member.id], mission.xp_reward)
+            days.append(day_rotation)
+
+        return RotationPlan(days, list(progress.values()))
+
+    @staticmethod
+    def _least_advanced_pick(missions, candidates_by_mission, done, busy, is_learning,
+                             standings, levels) -> Optional[tuple[Mission, Squad, int]]:
+        """The mission with the most XP that a free squad can do, with the
+        least advanced of those squads."""
+        for mission in missions:
+            if mission.name in done:
+                continue
+            best_key = None
+            best = None
+            for position, squad, ids, _ in candidates_by_mission[mission.name]:
+                if any(id in busy for id in ids):
+                    continue
+                nb_learning = sum(is_learning[id] for id in ids)
+                if nb_learning == 0:
+                    continue
+                key = (sum(standings[id] for id in ids), sum(levels[id] for id in ids),
+                       squad.aggregate, position)
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best = (mission, squad, mission.xp_reward * nb_learning)
+            if best is not None:
+                return best
+        return None
+
+    @staticmethod
+    def _most_xp_pick(candidates, done, busy, is_learning,
+                      standings, levels) -> Optional[tuple[Mission, Squad, int]]:
+        """The (mission, squad) pair with the most useful XP."""
+        best_key = None
+        best = None
+        for position, squad, ids, squad_missions in candidates:
+            if any(id in busy for id in ids):
+                continue
+            nb_learning = sum(is_learning[id] for id in ids)
+            if nb_learning == 0:
+                continue
+            mission = next((mission for mission in squad_missions
+                            if mission.name not in done), None)
+            if mission is None:
+                continue
+            useful_xp = mission.xp_reward * nb_learning
+            key = (-useful_xp, sum(standings[id] for id in ids),
+                   sum(levels[id] for id in ids), squad.aggregate, position)
+            if best_key is None or key < best_key:
+                best_key = key
+                best = (mission, squad, useful_xp)
+        return best
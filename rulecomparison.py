@@ -0,0 +1,114 @@
+"""Side by side evaluation of several guesses of the course rules.
+
+    comparison = compare_rule_sets(squadron, [DEFAULT_RULES, REBALANCE_FIRST_RULES], 3)
+    print(comparison)
+
+Every rule set gets its own transition table, but they all share the same
+training states (in the order of `transitions.iter_training_states`), so
+one walk of the programs carries a state index per rule set down each
+branch, and the squads are evaluated against the missions once per state,
+whatever the number of rule sets.
+"""
+from attributes import Attributes
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+from courserules import RuleSet
+from feasibility import build_unlock_map, iter_missions_in_mask
+from squadronplanner import Course, Mission, Squadron, get_transition_table
+
+
+@dataclass
+class RuleDifference:
+    """A program that doesn't unlock the same missions under all the rule sets."""
+    courses: tuple[Course, ...]
+    # One per rule set, in the order of `RuleComparison.rule_sets`
+    attrs: tuple[Attributes, ...]
+    doable_masks: tuple[int, ...]
+
+
+@dataclass
+class RuleComparison:
+    rule_sets: list[RuleSet]
+    missions: list[Mission]
+    nb_courses: int
+    nb_programs: int = 0
+    # Programs that end on different training attributes...
+    nb_different_attrs: int = 0
+    # ...and those, among them, that don't unlock the same missions,
+    #   each program right before the longer ones that start with it
+    differences: list[RuleDifference] = field(default_factory=list)
+
+    def iter_report_lines(self, limit: Optional[int] = None):
+        names = [rules.name for rules in self.rule_sets]
+        yield f"Rule sets: {', '.join(names)}"
+        yield (f"{self.nb_programs} programs of 1 to {self.nb_courses} courses, "
+               f"{self.nb_different_attrs} with different attributes, "
+               f"{len(self.differences)} with different doable missions")
+        for difference in self.differences[:limit]:
+            yield ""
+            yield ", ".join(course.name for course in difference.courses)
+            everywhere = -1
+            for mask in difference.doable_masks:
+                everywhere &= mask
+            for name, attr, mask in zip(names, difference.attrs, difference.doable_masks):
+                only_here = [mission.name
+                             for mission in iter_missions_in_mask(self.missions, mask & ~everywhere)]
+                yield (f"  {name:20} {attr}  {mask.bit_count():2} missions"
+                       + (f", only: {', '.join(only_here)}" if only_here else ""))
+        if limit is not None and len(self.differences) > limit:
+            yield ""
+            yield f"... and {len(self.differences) - limit} more"
+
+    def __str__(self):
+        return "\n".join(self.iter_report_lines())
+
+
+def compare_rule_sets(
+    squadron: Squadron,
+    rule_sets: Sequence[RuleSet],
+    nb_courses: int
+) -> RuleComparison:
+    """Evaluates every program of 1 to `nb_courses` courses, from the
+    squadron's training attributes, under each rule set, and keeps the
+    programs whose doable missions depend on the rules.
+
+    The rule sets can end a prefix on the same state and still part ways
+    on the next course, so every prefix is walked to the end.
+    """
+    rule_sets = list(rule_sets)
+    max_aggregate = squadron.max_training_attr
+    tables = [get_transition_table(max_aggregate, rules) for rules in rule_sets]
+    states = tables[0].states
+    if any(table.states != states for table in tables):
+        raise ValueError("The rule sets don't share the same training states")
+    initial_index = tables[0].index_of.get(squadron.training_attr)
+    if initial_index is None:
+        raise ValueError(f"{squadron.training_attr} is not a training state")
+
+    unlock_map = build_unlock_map(squadron)
+    doable_masks = unlock_map.doable_masks
+    comparison = RuleComparison(rule_sets, unlock_map.missions, nb_courses)
+    courses = list(Course)
+    nb_table_courses = len(courses)
+    next_states = [table.next_states for table in tables]
+
+    def walk(prefix: tuple[int, ...], state_indexes: tuple[int, ...]) -> None:
+        nb_courses_left = nb_courses - len(prefix) - 1
+        for course_index in range(nb_table_courses):
+            new_indexes = tuple(table_next[index * nb_table_courses + course_index]
+                                for table_next, index in zip(next_states, state_indexes))
+            comparison.nb_programs += 1
+            if any(index != new_indexes[0] for index in new_indexes):
+                comparison.nb_different_attrs += 1
+                masks = tuple(doable_masks[index] for index in new_indexes)
+                if any(mask != masks[0] for mask in masks):
+                    comparison.differences.append(RuleDifference(
+                        tuple(courses[i] for i in prefix + (course_index,)),
+                        tuple(states[index] for index in new_indexes),
+                        masks))
+            if nb_courses_left > 0:
+                walk(prefix + (course_index,), new_indexes)
+
+    if nb_courses > 0:
+        walk((), (initial_index,) * len(rule_sets))
+    return comparison
@@ -0,0 +1,399 @@
+"""Local planner service: keeps squadrons and their squads, indexes and
+sweeps in memory, and answers JSON queries over HTTP on localhost.
+
+    python service.py Squadron-2021-09-24.csv --port 8765
+
+    GET  /squadrons
+    PUT  /squadrons/<name>                  {"filename": "Squadron-2021-09-24.csv"}
+    GET  /squadrons/<name>
+    GET  /squadrons/<name>/doable?courses=PHY_MEN,PHY,PHY
+    GET  /squadrons/<name>/lowest?courses=PHY_MEN,PHY,PHY
+    GET  /squadrons/<name>/sweep?depth=3&min_missions=7
+    POST /squadrons/<name>/members/<id>     {"attr": [24, 88, 62], "level": 40}
+    POST /squadrons/<name>/missions/<name>  {"is_available": false}
+    POST /squadrons/<name>/training         {"attr": [20, 120, 140]}
+
+PUT of an already loaded squadron applies the new export incrementally
+(see `Squadron.update_from`), and so do the POSTs. Every update drops the
+sweeps of that squadron, the rest stays warm.
+
+Only the standard library is used, and the server only listens on
+localhost by default: it's meant for a local client, not the internet.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import sys
+from attributes import Attributes
+from cli import parse_courses
+from csvparser import load_squadron
+from feasibility import FeasibilityTable
+from fleet import attr_as_list
+from typing import Optional
+from resultcache import cached_sweep
+from squadronplanner import Course, Mission, Squad, Squadron, TrainingProgram
+from urllib.parse import parse_qs, unquote, urlsplit
+
+MAX_BODY_SIZE = 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _attr_from_json(value, max_aggregate: Optional[int] = None) -> Attributes:
+    """[phy, men, tac], each a non-negative integer, and adding up to at
+    most `max_aggregate` (if specified)."""
+    if (not isinstance(value, list) or len(value) != 3
+            or not all(isinstance(x, int) and not isinstance(x, bool) for x in value)):
+        raise HTTPError(400, f"expected [phy, men, tac], got {value!r}")
+    if any(x < 0 for x in value):
+        raise HTTPError(400, f"attributes can't be negative, got {value!r}")
+    if max_aggregate is not None and sum(value) > max_aggregate:
+        raise HTTPError(400, f"attributes add up to more than {max_aggregate}, got {value!r}")
+    return Attributes(*value)
+
+
+def _parse_courses(text: str) -> tuple[Course, ...]:
+    try:
+        return parse_courses(text)
+    except argparse.ArgumentTypeError as error:
+        raise HTTPError(400, str(error)) from None
+
+
+def _int_param(query: dict, name: str, default: int) -> int:
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' is not a number: {values[0]!r}") from None
+
+
+class PlannerState:
+    """The warm state of the service: squadrons by name, and their sweeps
+    by number of courses.
+
+    Everything but the sweeps runs on the event loop thread, so there's no
+    locking: a request never sees a squadron halfway through an update.
+    The sweeps take seconds when cold, so they're computed in the default
+    executor, on a copy of the squadron taken on the loop thread, and
+    thrown away if the squadron changed in the meantime."""
+
+    def __init__(self):
+        self.squadrons: dict[str, Squadron] = dict()
+        # By squadron, then by number of courses
+        self.sweeps: dict[str, dict[int, FeasibilityTable]] = dict()
+        # Bumped by every update, to recognize the sweeps of an older squadron
+        self.versions: dict[str, int] = dict()
+        # Sweeps being computed, by (squadron, depth): (version, future)
+        self.pending_sweeps: dict[tuple[str, int], tuple[int, asyncio.Future]] = dict()
+
+    def get(self, name: str) -> Squadron:
+        squadron = self.squadrons.get(name)
+        if squadron is None:
+            raise HTTPError(404, f"no squadron named {name!r}")
+        return squadron
+
+    def load(self, name: str, filename: str) -> bool:
+        """Loads an export. Returns False if it updated a loaded squadron."""
+        try:
+            new_squadron = load_squadron(filename)
+        except (OSError, ValueError) as error:
+            raise HTTPError(400, str(error)) from None
+
+        self.changed(name)
+        squadron = self.squadrons.get(name)
+        if squadron is None:
+            new_squadron.build_squads()
+            self.squadrons[name] = new_squadron
+            return True
+        squadron.update_from(new_squadron)
+        return False
+
+    def changed(self, name: str) -> None:
+        self.sweeps.pop(name, None)
+        self.versions[name] = self.versions.get(name, 0) + 1
+
+    async def get_sweep(self, name: str, depth: int) -> FeasibilityTable:
+        table = self.sweeps.get(name, {}).get(depth)
+        if table is not None:
+            return table
+
+        version = self.versions.get(name, 0)
+        pending = self.pending_sweeps.get((name, depth))
+        if pending is not None and pending[0] == version:
+            # Someone already asked for the same sweep: wait for their answer
+            return await asyncio.shield(pending[1])
+
+        snapshot = _snapshot(self.get(name))
+        future = asyncio.get_running_loop().run_in_executor(None, _compute_sweep, snapshot, depth)
+        self.pending_sweeps[(name, depth)] = (version, future)
+        try:
+            table = await asyncio.shield(future)
+        finally:
+            pending = self.pending_sweeps.get((name, depth))
+            if pending is not None and pending[1] is future:
+                del self.pending_sweeps[(name, depth)]
+        if self.versions.get(name, 0) == version:
+            self.sweeps.setdefault(name, {})[depth] = table
+        return table
+
+
+def _snapshot(squadron: Squadron) -> Squadron:
+    """A copy of the squadron that the updates on the loop thread won't touch.
+    Its squads are built by `_compute_sweep`, off the loop."""
+    return Squadron(copy.deepcopy(squadron.members), copy.deepcopy(squadron.missions),
+                    squadron.training_attr, squadron.max_training_attr,
+                    squadron.remaining_daily_courses, squadron.squad_size,
+                    squadron.max_built_squads)
+
+
+def _compute_sweep(squadron: Squadron, depth: int) -> FeasibilityTable:
+    squadron.build_squads()
+    return cached_sweep(squadron, depth)
+
+
+def _describe(squadron: Squadron) -> dict:
+    return {
+        "training_attr": attr_as_list(squadron.training_attr),
+        "max_training_attr": squadron.max_training_attr,
+        "members": [{"id": member.id, "name": member.name, "job": member.job,
+                     "level": member.level, "attr": attr_as_list(member.attr)}
+                    for member in squadron.members],
+        "missions": [{"name": mission.name, "level": mission.level,
+                      "xp_reward": mission.xp_reward, "is_available": mission.is_available,
+                      "requirements": attr_as_list(mission.requirements)}
+                     for mission in squadron.missions],
+    }
+
+
+def _lowest_squads(squadron: Squadron, attr: Attributes) -> list[tuple[Mission, Squad]]:
+    result = []
+    for mission in squadron.iter_available_missions():
+        squad = squadron.find_lowest_qualifying_squad(mission, attr)
+        if squad is not None:
+            result.append((mission, squad))
+    return result
+
+
+def _program_for(squadron: Squadron, query: dict) -> TrainingProgram:
+    courses = _parse_courses(query.get('courses', [''])[0])
+    return TrainingProgram(courses, squadron.training_attr, squadron.max_training_attr)
+
+
+def _program_as_json(program: TrainingProgram) -> dict:
+    return {"courses": [course.name for course in program.courses],
+            "attr": attr_as_list(program.attr),
+            "is_redundant": program.is_redundant}
+
+
+async def handle(state: PlannerState, method: str, target: str, body: Optional[dict]) -> dict:
+    """Answers one request, as a JSON-friendly dict. Raises `HTTPError`.
+
+    Only the sweeps are awaited, the rest is answered right away."""
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    parts = [unquote(part) for part in url.path.split('/') if part != '']
+    if len(parts) == 0 or parts[0] != 'squadrons':
+        raise HTTPError(404, f"no such resource: {url.path}")
+
+    if len(parts) == 1:
+        if method != 'GET':
+            raise HTTPError(405, f"{method} not allowed on {url.path}")
+        return {"squadrons": sorted(state.squadrons)}
+
+    name = parts[1]
+    resource = parts[2:]
+    if resource == []:
+        if method == 'PUT':
+            filename = (body or {}).get('filename')
+            if not isinstance(filename, str):
+                raise HTTPError(400, "expected {\"filename\": ...}")
+            created = state.load(name, filename)
+            return {"name": name, "created": created}
+        if method == 'GET':
+            return _describe(state.get(name))
+        raise HTTPError(405, f"{method} not allowed on {url.path}")
+
+    squadron = state.get(name)
+    if method == 'GET' and resource in (['doable'], ['lowest']):
+        program = _program_for(squadron, query)
+        lowest_squads = _lowest_squads(squadron, program.attr)
+        if resource == ['doable']:
+            return {"program": _program_as_json(program),
+                    "doable_missions": [mission.name for mission, _ in lowest_squads]}
+        return {"program": _program_as_json(program),
+                "lowest_squads": {mission.name: squad.id for mission, squad in lowest_squads}}
+
+    if method == 'GET' and resource == ['sweep']:
+        depth = _int_param(query, 'depth', 3)
+        min_missions = _int_param(query, 'min_missions', 0)
+        include_redundant = query.get('include_redundant', ['no'])[0].lower() in ('1', 'yes', 'true')
+        if not 0 <= depth <= 5:
+            raise HTTPError(400, "'depth' must be between 0 and 5")
+        table = await state.get_sweep(name, depth)
+        rows = []
+        for program, doable_missions, _ in table.iter_rows():
+            if program.is_redundant and not include_redundant:
+                continue
+            if len(doable_missions) < min_missions:
+                continue
+            row = _program_as_json(program)
+            row["doable_missions"] = [mission.name for mission in doable_missions]
+            rows.append(row)
+        return {"depth": depth, "programs": rows}
+
+    if method == 'POST' and len(resource) == 2 and resource[0] == 'members':
+        try:
+            member_id = int(resource[1])
+            squadron.find_member(member_id)
+        except (ValueError, KeyError):
+            raise HTTPError(404, f"no member with id {resource[1]!r}") from None
+        body = body or {}
+        attr = _attr_from_json(body['attr']) if 'attr' in body else None
+        level = body.get('level')
+        if level is not None and (not isinstance(level, int) or isinstance(level, bool)
+                                  or level < 1):
+            raise HTTPError(400, f"'level' is not a positive number: {level!r}")
+        squadron.update_member(member_id, attr, level)
+        state.changed(name)
+        return {"updated": True}
+
+    if method == 'POST' and len(resource) == 2 and resource[0] == 'missions':
+        is_available = (body or {}).get('is_available')
+        if not isinstance(is_available, bool):
+            raise HTTPError(400, "expected {\"is_available\": true|false}")
+        try:
+            squadron.set_mission_available(resource[1], is_available)
+        except KeyError:
+            raise HTTPError(404, f"no mission named {resource[1]!r}") from None
+        state.changed(name)
+        return {"updated": True}
+
+    if method == 'POST' and resource == ['training']:
+        squadron.set_training_attr(_attr_from_json((body or {}).get('attr'),
+                                                   squadron.max_training_attr))
+        state.changed(name)
+        return {"updated": True}
+
+    raise HTTPError(404, f"no such resource: {method} {url.path}")
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[tuple[str, str, dict, bytes]]:
+    """(method, target, headers, body), or None when the client is gone."""
+    request_line = await reader.readline()
+    if request_line in (b'', b'\r\n', b'\n'):
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'', b'\r\n', b'\n'):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    length = headers.get('content-length', '0') or '0'
+    if not (length.isascii() and length.isdigit()):
+        raise HTTPError(400, f"Content-Length is not a number: {length!r}")
+    length = int(length)
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, f"body larger than {MAX_BODY_SIZE} bytes")
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method.upper(), target, headers, body
+
+
+def _response(status: int, payload: dict, keep_alive: bool) -> bytes:
+    content = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + content
+
+
+class PlannerServer:
+    """HTTP/1.1 with keep-alive, so that a load-testing client can reuse its
+    connections."""
+
+    def __init__(self, state: Optional[PlannerState] = None):
+        self.state = PlannerState() if state is None else state
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, raw_body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    try:
+                        body = json.loads(raw_body) if raw_body else None
+                    except json.JSONDecodeError as error:
+                        raise HTTPError(400, f"invalid JSON: {error}") from None
+                    if body is not None and not isinstance(body, dict):
+                        raise HTTPError(400, "expected a JSON object")
+                    status, payload = 200, await handle(self.state, method, target, body)
+                except HTTPError as error:
+                    status, payload = error.status, {"error": str(error)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception:
+                    logging.exception("Error while answering a request")
+                    status, payload = 500, {"error": "internal error"}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._serve_client, host, port)
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8765) -> None:
+        server = await self.start(host, port)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        logging.info(f"Serving on {addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve squadron planning queries on localhost.")
+    parser.add_argument('exports', nargs='*', help="Squadron-*.csv exports to load at start")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    state = PlannerState()
+    for filename in args.exports:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        state.load(name, filename)
+        logging.info(f"Loaded {name}")
+
+    try:
+        asyncio.run(PlannerServer(state).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+from attributes import Attributes
+from bisect import bisect_left
+from typing import Iterator
+
+
+class SquadBitsets:
+    """Sets of squads as integer bitsets: bit `i` stands for `squads[i]`.
+
+    For each attribute, we keep the squads that have at least each value of
+    that attribute found in a squad. The squads that clear a mission with
+    some training attributes are the AND of the three bitsets for
+    "requirement - training", and counting them is a popcount.
+
+        >>> from squadronplanner import Member, Squad
+        >>> squads = [Squad(str(i), (Member("", Attributes(i, 10 - i, 5), 1, ""),))
+        ...           for i in range(4)]
+        >>> bitsets = SquadBitsets(squads)
+        >>> bin(bitsets.clearing(1, 8, 5))
+        '0b110'
+        >>> SquadBitsets.count(bitsets.clearing(1, 8, 5))
+        2
+        >>> [squad.id for squad in bitsets.iter_squads(bitsets.clearing(0, 0, 6))]
+        []
+    """
+
+    def __init__(self, squads: list):
+        self.squads = squads
+        self.everyone = (1 << len(squads)) - 1
+        # For each attribute: the distinct values (increasing), and, for
+        #   each of them, the bitset of the squads with at least that value.
+        self.values: list[list[int]] = []
+        self.at_least_bitsets: list[list[int]] = []
+        for axis in ('phy', 'men', 'tac'):
+            by_value: dict[int, int] = dict()
+            for position, squad in enumerate(squads):
+                value = getattr(squad.attr, axis)
+                by_value[value] = by_value.get(value, 0) | (1 << position)
+            values = sorted(by_value)
+            bitsets = [0] * len(values)
+            bits = 0
+            for i in range(len(values) - 1, -1, -1):
+                bits |= by_value[values[i]]
+                bitsets[i] = bits
+            self.values.append(values)
+            self.at_least_bitsets.append(bitsets)
+
+    def _at_least(self, axis: int, value: int) -> int:
+        values = self.values[axis]
+        i = bisect_left(values, value)
+        if i == len(values):
+            return 0
+        return self.at_least_bitsets[axis][i]
+
+    def clearing(self, phy: int, men: int, tac: int) -> int:
+        """The squads that have at least these attributes by themselves."""
+        bits = self._at_least(0, phy)
+        if bits:
+            bits &= self._at_least(1, men)
+        if bits:
+            bits &= self._at_least(2, tac)
+        return bits
+
+    def for_mission(self, requirements: Attributes, training_attr: Attributes) -> int:
+        """The squads that clear `requirements` with `training_attr`."""
+        return self.clearing(requirements.phy - training_attr.phy,
+                             requirements.men - training_attr.men,
+                             requirements.tac - training_attr.tac)
+
+    @staticmethod
+    def count(bits: int) -> int:
+        return bits.bit_count()
+
+    def iter_squads(self, bits: int) -> Iterator:
+        """The squads of a bitset, in the order of `squads`."""
+        while bits:
+            lowest_bit = bits & -bits
+            yield self.squads[lowest_bit.bit_length() - 1]
+            bits ^= lowest_bit
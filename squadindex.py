@@ -0,0 +1,139 @@
+import instrumentation
+from attributes import Attributes
+from operator import attrgetter
+from typing import Optional
+
+
+class _Node:
+    __slots__ = ('phy', 'men', 'tac', 'rank', 'squad',
+                 'max_phy', 'max_men', 'max_tac', 'min_rank',
+                 'left', 'right')
+
+
+class SquadIndex:
+    """Answers "which squad with the lowest aggregate has at least these
+    attributes?" without scanning every squad.
+
+    Squads are ranked by aggregate (ties keep the order of `squads`), then
+    stored in a 3-D tree (k-d tree) over (phy, men, tac). Every node knows
+    the best attributes and the best rank found below it, so a query skips
+    any subtree that either can't clear the requirements, or can't beat the
+    squad found so far.
+
+    A squad can only be made useless by a squad with the same attributes:
+    a squad that is at least as good on all three attributes always has an
+    aggregate at least as high. So only those duplicates are dropped.
+    """
+
+    def __init__(self, squads: list):
+        self.squads_by_aggregate = sorted(squads, key=attrgetter('aggregate'))
+
+        nodes = []
+        seen_attrs: set[Attributes] = set()
+        for rank, squad in enumerate(self.squads_by_aggregate):
+            if squad.attr in seen_attrs:
+                continue
+            seen_attrs.add(squad.attr)
+            node = _Node()
+            node.phy = squad.attr.phy
+            node.men = squad.attr.men
+            node.tac = squad.attr.tac
+            node.rank = rank
+            node.squad = squad
+            nodes.append(node)
+        self.nb_kept_squads = len(nodes)
+        self.root = self._build(nodes, 0)
+
+    def _build(self, nodes: list[_Node], depth: int) -> Optional[_Node]:
+        if len(nodes) == 0:
+            return None
+
+        axis = ('phy', 'men', 'tac')[depth % 3]
+        nodes.sort(key=attrgetter(axis))
+        median = len(nodes) // 2
+        node = nodes[median]
+        node.left = self._build(nodes[:median], depth + 1)
+        node.right = self._build(nodes[median + 1:], depth + 1)
+
+        node.max_phy = node.phy
+        node.max_men = node.men
+        node.max_tac = node.tac
+        node.min_rank = node.rank
+        for child in (node.left, node.right):
+            if child is None:
+                continue
+            node.max_phy = max(node.max_phy, child.max_phy)
+            node.max_men = max(node.max_men, child.max_men)
+            node.max_tac = max(node.max_tac, child.max_tac)
+            node.min_rank = min(node.min_rank, child.min_rank)
+        return node
+
+    def find_lowest(self, phy: int, men: int, tac: int):
+        """The squad with the lowest aggregate that has at least `phy`,
+        `men` and `tac`, or None. Among squads with the same aggregate,
+        the first one in `squads_by_aggregate`, exactly like a scan:
+
+            >>> import random
+            >>> from squadronplanner import Member, Squad
+            >>> rng = random.Random(2021)
+            >>> def random_squad(i):
+            ...     # Few distinct attributes, so that many squads tie
+            ...     members = tuple(Member("", Attributes(*rng.choices((0, 10, 20), k=3)), 1, "")
+            ...                     for _ in range(2))
+            ...     return Squad(str(i), members)
+            >>> index = SquadIndex([random_squad(i) for i in range(200)])
+            >>> def qualifying(phy, men, tac):
+            ...     return [(squad.aggregate, position, squad)
+            ...             for position, squad in enumerate(index.squads_by_aggregate)
+            ...             if squad.attr.phy >= phy and squad.attr.men >= men
+            ...             and squad.attr.tac >= tac]
+            >>> def scan(*gap):
+            ...     entries = qualifying(*gap)
+            ...     return min(entries, key=lambda entry: entry[:2])[2] if entries else None
+            >>> gaps = [(phy, men, tac) for phy in range(-5, 50, 5)
+            ...         for men in range(-5, 50, 5) for tac in range(-5, 50, 5)]
+            >>> all(index.find_lowest(*gap) is scan(*gap) for gap in gaps)
+            True
+
+        Among those gaps, the ones where squads of different attributes
+        tie for the lowest aggregate, and the ones no squad can fill:
+
+            >>> sum(len({squad.attr for aggregate, _, squad in qualifying(*gap)
+            ...          if aggregate == scan(*gap).aggregate}) > 1
+            ...     for gap in gaps if scan(*gap) is not None)
+            168
+            >>> sum(scan(*gap) is None for gap in gaps)
+            347
+        """
+        best = None
+        nb_visited = 0
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            nb_visited += 1
+            if (node.max_phy < phy or node.max_men < men or node.max_tac < tac
+                    or (best is not None and node.min_rank >= best.rank)):
+                continue
+            if (node.phy >= phy and node.men >= men and node.tac >= tac
+                    and (best is None or node.rank < best.rank)):
+                best = node
+
+            # Push the most promising child last, so that it's visited first.
+            left, right = node.left, node.right
+            if left is not None and right is not None and left.min_rank < right.min_rank:
+                left, right = right, left
+            if left is not None:
+                stack.append(left)
+            if right is not None:
+                stack.append(right)
+        if instrumentation.enabled:
+            instrumentation.count("lowest_squad.index_nodes_visited", nb_visited)
+        return None if best is None else best.squad
+
+    def find_lowest_for(self, requirements: Attributes, training_attr: Attributes):
+        """Same as `find_lowest`, for a squad that will also get the
+        squadron's training attributes."""
+        return self.find_lowest(
+            requirements.phy - training_attr.phy,
+            requirements.men - training_attr.men,
+            requirements.tac - training_attr.tac)
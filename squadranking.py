@@ -0,0 +1,198 @@
+import heapq
+import instrumentation
+from attributes import Attributes, packed_clears
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Iterable, Optional
+from squadronplanner import Mission, Squad, Squadron, TrainingProgram
+
+# Members at the level cap don't get anything from the XP of a mission.
+MEMBER_LEVEL_CAP = 60
+
+
+class Metric(Enum):
+    """How squads are ranked. Lower scores are better: the score is the
+    value of the metric, negated for the metrics where higher is better."""
+    LOWEST_AGGREGATE = 'aggregate'
+    # Mission XP for each attribute point of the squad: the most XP for the
+    #   least effort.
+    XP_PER_ATTR = 'xp_per_attr'
+    # Members at the level cap, whose share of the XP is lost.
+    FEWEST_OVER_LEVELLED = 'over_levelled'
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self is Metric.XP_PER_ATTR
+
+    def value(self, squad: Squad, mission: Mission) -> float:
+        """The metric itself, as shown to the user."""
+        if self is Metric.LOWEST_AGGREGATE:
+            return squad.aggregate
+        if self is Metric.XP_PER_ATTR:
+            return mission.xp_reward / max(squad.aggregate, 1)
+        return sum(1 for member in squad.members if member.level >= MEMBER_LEVEL_CAP)
+
+    def best_score_from(self, mission: Mission, aggregate: int) -> float:
+        """The best score any squad with at least this aggregate can get,
+        to stop going through squads by increasing aggregate."""
+        if self is Metric.LOWEST_AGGREGATE:
+            return aggregate
+        if self is Metric.XP_PER_ATTR:
+            return -mission.xp_reward / max(aggregate, 1)
+        return 0
+
+
+@dataclass(order=True)
+class RankedSquad:
+    # (metric score, aggregate, position of the squad, position of the query)
+    rank: tuple
+    squad: Squad = field(compare=False)
+    mission: Mission = field(compare=False)
+    # The metric, not negated like the score in the rank
+    value: float = field(compare=False)
+    program: Optional[TrainingProgram] = field(compare=False, default=None)
+
+    @classmethod
+    def of(
+        cls,
+        squad: Squad,
+        mission: Mission,
+        metric: Metric,
+        positions: tuple[int, int],
+        program: Optional[TrainingProgram] = None
+    ) -> 'RankedSquad':
+        """`positions` are those of the squad and of the query."""
+        value = metric.value(squad, mission)
+        score = -value if metric.higher_is_better else value
+        return cls((score, squad.aggregate) + positions, squad, mission, value, program)
+
+    def __str__(self):
+        program = "" if self.program is None else f"    {self.program}"
+        return f"{self.value:10.3f}    {self.squad}    {self.mission}{program}"
+
+
+class _TopK:
+    """The k best (lowest rank) entries seen so far, in a max-heap of
+    negated ranks, so the worst of them is always at the top."""
+
+    def __init__(self, k: int):
+        if k < 1:
+            raise ValueError(f"Expected k >= 1, got {k}")
+        self.k = k
+        self.heap: list[tuple[tuple, int, RankedSquad]] = []
+        self.keys: set[tuple[str, str]] = set()
+        self.nb_pushed = 0
+
+    def is_full(self) -> bool:
+        return len(self.heap) >= self.k
+
+    def worst_rank(self) -> tuple:
+        return self.heap[0][2].rank
+
+    def push(self, entry: RankedSquad) -> None:
+        key = (entry.mission.name, entry.squad.id)
+        if key in self.keys:
+            # Already in, with an earlier program.
+            return
+        if self.is_full():
+            if entry.rank >= self.worst_rank():
+                return
+            _, _, evicted = heapq.heappop(self.heap)
+            self.keys.discard((evicted.mission.name, evicted.squad.id))
+        negated = tuple(-value for value in entry.rank)
+        # nb_pushed breaks the ties, so that entries are never compared.
+        heapq.heappush(self.heap, (negated, self.nb_pushed, entry))
+        self.keys.add(key)
+        self.nb_pushed += 1
+
+    def sorted(self) -> list[RankedSquad]:
+        return sorted(entry for _, _, entry in self.heap)
+
+
+def _collect(
+    top: _TopK,
+    squadron: Squadron,
+    mission: Mission,
+    training_attr: Attributes,
+    metric: Metric,
+    query_position: int,
+    program: Optional[TrainingProgram]
+) -> None:
+    squad_index = squadron.get_squad_index()
+    if squad_index is not None:
+        squads = squad_index.squads_by_aggregate
+        by_aggregate = True
+    else:
+        # Too many squads to build them all: every squad gets scored.
+        squads = squadron.iter_squads()
+        by_aggregate = False
+
+    packed_training = training_attr.pack()
+    packed_requirements = mission.requirements.pack()
+    nb_scanned = 0
+    for position, squad in enumerate(squads):
+        if by_aggregate and top.is_full():
+            best_possible = (metric.best_score_from(mission, squad.aggregate),
+                             squad.aggregate, position, query_position)
+            if best_possible >= top.worst_rank():
+                # Every squad left has at least this aggregate.
+                break
+        nb_scanned += 1
+        if not packed_clears(squad.packed_attr + packed_training, packed_requirements):
+            continue
+        top.push(RankedSquad.of(squad, mission, metric, (position, query_position), program))
+    if instrumentation.enabled:
+        instrumentation.count("ranking.squads_scanned", nb_scanned)
+
+
+def top_squads_for_mission(
+    squadron: Squadron,
+    mission: Mission,
+    training_attr: Attributes,
+    k: int = 5,
+    metric: Metric = Metric.LOWEST_AGGREGATE
+) -> list[RankedSquad]:
+    """The `k` best qualifying squads for a mission, best first.
+
+    With `Metric.LOWEST_AGGREGATE` and k=1, that's the squad of
+    `Squadron.find_lowest_qualifying_squad`."""
+    top = _TopK(k)
+    _collect(top, squadron, mission, training_attr, metric, 0, None)
+    return top.sorted()
+
+
+def top_squads(
+    squadron: Squadron,
+    programs: Iterable[TrainingProgram],
+    k: int = 5,
+    metric: Metric = Metric.LOWEST_AGGREGATE,
+    missions: Optional[Iterable[Mission]] = None
+) -> list[RankedSquad]:
+    """The `k` best (mission, squad) pairs across all the available missions
+    (or `missions`) and all the `programs`, best first.
+
+    A pair is only listed once, with the first program that makes it
+    possible, so list the cheapest programs first. Programs that end on
+    the same training attributes as an earlier one are skipped.
+
+    A single heap of the k best pairs is shared by every query, and the
+    squads are scanned by increasing aggregate, so each query stops as
+    soon as no remaining squad can get into the top k.
+    """
+    if missions is None:
+        missions = list(squadron.iter_available_missions())
+    else:
+        missions = list(missions)
+
+    top = _TopK(k)
+    seen_attrs: set[Attributes] = set()
+    query_position = 0
+    with instrumentation.phase("top_squads"):
+        for program in programs:
+            if program.attr in seen_attrs:
+                continue
+            seen_attrs.add(program.attr)
+            for mission in missions:
+                _collect(top, squadron, mission, program.attr, metric, query_position, program)
+                query_position += 1
+    return top.sorted()
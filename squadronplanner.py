@@ -1,9 +1,16 @@
-from attributes import Attributes
-from dataclasses import dataclass, field
-from itertools import combinations, islice, product
-from operator import attrgetter
-from typing import Optional
+import instrumentation
+import os
+from attributes import Attributes, packed_clears
+from courserules import DEFAULT_RULES, RuleSet
+from dataclasses import InitVar, dataclass, field
+from itertools import combinations
+from math import comb
+from typing import Optional, Sequence
 from enum import Enum, unique
+from squadbitsets import SquadBitsets
+from squadindex import SquadIndex
+from squadsearch import find_lowest_squad_members
+from transitions import DEFAULT_CACHE_DIR, TransitionTable, load_or_build
 
 @dataclass
 class Member:
@@ -35,11 +42,17 @@ class Squad:
     members: tuple[Member]
     attr: Attributes = field(init=False)
     aggregate: int = field(init=False)
+    packed_attr: int = field(init=False, repr=False)
 
     def __post_init__(self):
+        self.update_attr()
+
+    def update_attr(self) -> None:
+        """Recalculates the squad attributes, after a member changed."""
         attr_as_list = [member.attr for member in self.members]
         self.attr = sum(attr_as_list, start=Attributes())
         self.aggregate = self.attr.aggregate()
+        self.packed_attr = self.attr.pack()
 
     def __str__(self):
         return f"{self.id} {self.attr} (aggr={self.aggregate})"
@@ -64,9 +77,16 @@ class TrainingProgram:
     max_aggregate: int
     is_redundant: bool = field(init=False)
     attr: Attributes = field(init=False)
-
-    def __post_init__(self):
-        self.is_redundant, self.attr = self.calculate_program()
+    # (is_redundant, attr), when the caller already knows them
+    #   (eg: `feasibility.iter_programs` walking the courses depth-first)
+    known_result: InitVar[Optional[tuple[bool, Attributes]]] = None
+    # The course rules (see `courserules`)
+    rules: RuleSet = field(default=DEFAULT_RULES, repr=False, compare=False)
+
+    def __post_init__(self, known_result):
+        if known_result is None:
+            known_result = self.calculate_program()
+        self.is_redundant, self.attr = known_result
     
     def __str__(self):
         course_names = [course.name for course in self.courses]
@@ -78,121 +98,33 @@ class TrainingProgram:
         base_attr: Attributes, 
         course: Course
     ) -> Attributes:
-        # Base data:
-        if course == Course.PHY:
-            intended_delta = Attributes(40, 0, 0)
-        elif course == Course.MEN:
-            intended_delta = Attributes(0, 40, 0)
-        elif course == Course.TAC:
-            intended_delta = Attributes(0, 0, 40)
-        elif course == Course.PHY_MEN:
-            intended_delta = Attributes(20, 20, 0)
-        elif course == Course.PHY_TAC:
-            intended_delta = Attributes(20, 0, 20)
-        elif course == Course.MEN_TAC:
-            intended_delta = Attributes(0, 20, 20)
-        else:
-            raise ValueError(f"course = {course}")
-        # "delta" means "change in..."
-        # so "intended_delta" means "intended change to base attributes"
-
-        # When we can apply the intended delta
-        # Best case scenario, but very rare
-        if base_attr.has_room_for_delta(intended_delta, self.max_aggregate):
-            return base_attr + intended_delta
-
-        # When we start at max_aggregate
-        # Most common scenario
-        if course == Course.PHY:
-            balanced_delta = Attributes(40, -20, -20)
-        elif course == Course.MEN:
-            balanced_delta = Attributes(-20, 40, -20)
-        elif course == Course.TAC:
-            balanced_delta = Attributes(-20, -20, 40)
-        elif course == Course.PHY_MEN:
-            balanced_delta = Attributes(20, 20, -40)
-        elif course == Course.PHY_TAC:
-            balanced_delta = Attributes(20, -40, 20)
-        elif course == Course.MEN_TAC:
-            balanced_delta = Attributes(-40, 20, 20)
-        
-        if base_attr.has_room_for_delta(balanced_delta, self.max_aggregate):
-            return base_attr + balanced_delta
-        
-        # If the function has still not returned, 
-        #   then one attribute will either go negative,
-        #   or break the max after the delta.
-        # Since we assume all individual attributes are multiples of 20,
-        #   we have these solutions:
-        #   A) Reduce the delta.              Eg: ( 40/  0/  0) -> ( 20/  0/ 0)
-        #   B) Reduce the balancing.          Eg: (-40/ 20/ 20) -> (-20/ 20/20)
-        #   C) Balance on a single attribute. Eg: ( 40/-20/-20) -> ( 40/-40/ 0)
-        #   D) (next section)
-        # Because of the "multiples of 20" rule, not all of these solution can
-        #   be used on all courses.
-        # Because the goal of training courses is to *increase* the stats, 
-        #   we will prioritize the solution with the biggest increases.
-        #
-        # NB.: This Python script attempts to emulate the in-game rules,
-        #   and none of our rules & assumptions have been tested yet.
-
-        reduced_delta = None
-        reduced_balancing_delta = None
-        reduced_delta_1 = None
-        reduced_delta_2 = None
-        rebalanced_1_delta = None
-        rebalanced_2_delta = None
-        if course == Course.PHY:
-            reduced_delta = Attributes(20, 0, 0)
-            rebalanced_1_delta = Attributes(40, -40,   0)
-            rebalanced_2_delta = Attributes(40,   0, -40)
-        elif course == Course.MEN:
-            reduced_delta = Attributes(0, 20, 0)
-            rebalanced_1_delta = Attributes(-40, 40,   0)
-            rebalanced_2_delta = Attributes(  0, 40, -40)
-        elif course == Course.TAC:
-            reduced_delta = Attributes(0, 0, 20)
-            rebalanced_1_delta = Attributes(-40,   0, 40)
-            rebalanced_2_delta = Attributes(  0, -40, 40)
-        elif course == Course.PHY_MEN:
-            reduced_balancing_delta = Attributes(20, 20, -20) 
-            reduced_delta_1 = Attributes(20, 0, 0) 
-            reduced_delta_2 = Attributes(0, 20, 0) 
-            rebalanced_1_delta = Attributes(20, 0, -20) 
-            rebalanced_2_delta = Attributes(0, 20, -20) 
-        elif course == Course.PHY_TAC:
-            reduced_balancing_delta = Attributes(20, -20, 20) 
-            reduced_delta_1 = Attributes(20, 0, 0) 
-            reduced_delta_2 = Attributes(0, 0, 20) 
-            rebalanced_1_delta = Attributes(20, -20, 0) 
-            rebalanced_2_delta = Attributes(0, -20, 20) 
-        elif course == Course.MEN_TAC:
-            reduced_balancing_delta = Attributes(-20, 20, 20) 
-            reduced_delta_1 = Attributes(0, 20, 0) 
-            reduced_delta_2 = Attributes(0, 0, 20) 
-            rebalanced_1_delta = Attributes(-20, 20, 0) 
-            rebalanced_2_delta = Attributes(-20, 0, 20) 
-        
-        # The order of this list is important, because that's where
-        #   the priorities are defined.
-        all_deltas = [
-            reduced_delta, 
-            reduced_balancing_delta, 
-            reduced_delta_1,
-            reduced_delta_2,
-            rebalanced_1_delta, 
-            rebalanced_2_delta]
-        
-        for delta in all_deltas:
-            if delta is not None and base_attr.has_room_for_delta(delta, self.max_aggregate):
-                return base_attr + delta
-
-
-        # If all attempts have failed, then the course cannot improve anything,
-        #   so we return what we started with.
-        return base_attr
+        # The rules themselves, and why they are what they are,
+        #   are in `courserules`.
+        if instrumentation.enabled:
+            self.rules.count_step(base_attr, course.name, self.max_aggregate)
+        return self.rules.apply(base_attr, course.name, self.max_aggregate)
 
     def calculate_program(self) -> tuple[bool, Attributes]:
+        # The empty program is also what builds the transition table,
+        #   so it must not ask for it.
+        if len(self.courses) == 0:
+            return False, self.initial_attr
+
+        table = get_transition_table(self.max_aggregate, self.rules)
+        course_indexes = [course.value - 1 for course in self.courses]
+        result = table.run_program(self.initial_attr, course_indexes)
+        if result is not None:
+            if instrumentation.enabled:
+                instrumentation.count("transitions.courses_looked_up", len(course_indexes))
+                count_course_steps(table, self.rules, table.index_of[self.initial_attr],
+                                   course_indexes)
+            return result
+
+        # The initial attributes are not a valid training state
+        #   (eg: not multiples of 20), so the table can't help.
+        return self.calculate_program_by_rules()
+
+    def calculate_program_by_rules(self) -> tuple[bool, Attributes]:
         is_redundant = False
         attr = self.initial_attr
 
@@ -206,6 +138,50 @@ class TrainingProgram:
         return is_redundant, attr
 
 
+# Bump the version of `DEFAULT_RULES` whenever they change,
+#   so that what was saved on disk with them gets rebuilt.
+RULES_VERSION = DEFAULT_RULES.version
+
+def count_course_steps(
+    table: TransitionTable,
+    rules: RuleSet,
+    state_index: int,
+    course_indexes: Sequence[int]
+) -> None:
+    """Counts the step each course of a path takes (see
+    `RuleSet.count_step`). Only call it when instrumentation is enabled."""
+    courses = list(Course)
+    for course_index in course_indexes:
+        rules.count_step(table.states[state_index], courses[course_index].name,
+                         table.max_aggregate)
+        state_index = table.next_index(state_index, course_index)
+
+
+_transition_tables: dict[tuple[str, int], TransitionTable] = dict()
+
+def get_transition_table(max_aggregate: int, rules: RuleSet = DEFAULT_RULES) -> TransitionTable:
+    """Transition table for the training rules, built once per rule set and
+    `max_aggregate`, and saved to disk for later runs and worker processes."""
+    key = (rules.fingerprint(), max_aggregate)
+    table = _transition_tables.get(key)
+    if table is not None:
+        return table
+    if instrumentation.enabled:
+        instrumentation.count("transitions.table_loaded")
+
+    courses = list(Course)
+    def apply_course(state: Attributes, course_index: int) -> Attributes:
+        return rules.apply(state, courses[course_index].name, max_aggregate)
+
+    filename = f"transitions-{rules.name}-v{rules.version}-{rules.fingerprint()}-{max_aggregate}.bin"
+    with instrumentation.phase("load_transition_table"):
+        table = load_or_build(
+            os.path.join(DEFAULT_CACHE_DIR, filename),
+            max_aggregate,
+            len(courses),
+            apply_course)
+    _transition_tables[key] = table
+    return table
 
 
 class Squadron:
@@ -215,64 +191,87 @@ class Squadron:
         missions: list[Mission],
         training_attr: Attributes,
         max_training_attr: int,
-        remaining_daily_courses: int=3
+        remaining_daily_courses: int=3,
+        squad_size: int=4,
+        max_built_squads: int=10_000
     ):
         self.members = members
         self.missions = missions
         self.training_attr = training_attr
         self.max_training_attr = max_training_attr
         self.remaining_daily_courses = remaining_daily_courses
+        self.squad_size = squad_size
+        # Past this number of squads, we don't build them all in memory,
+        #   and we search the members directly instead.
+        self.max_built_squads = max_built_squads
 
         self.squads: list[Squad] = list()
-        self.squads_by_asc_aggr: list[Squad] = list()
-        self.squads_by_des_aggr: list[Squad] = list()
-        self.squads_by_asc_phy: list[Squad] = list()
-        self.squads_by_des_phy: list[Squad] = list()
-        self.squads_by_asc_men: list[Squad] = list()
-        self.squads_by_des_men: list[Squad] = list()
-        self.squads_by_asc_tac: list[Squad] = list()
-        self.squads_by_des_tac: list[Squad] = list()
+        self.squad_index: Optional[SquadIndex] = None
+        self.squad_index_is_stale = False
+        # Same freshness as the index, since both only change with members
+        self.squad_bitsets: Optional[SquadBitsets] = None
+        self.squads_by_member_id: dict[int, list[Squad]] = dict()
+        self.squad_positions: dict[str, int] = dict()
+        # Answers of `find_lowest_squad_for_gap`, by gap.
+        #   They don't depend on the missions or the training attributes,
+        #   so only member changes can invalidate them.
+        self.lowest_squad_cache: dict[tuple[int, int, int], Optional[Squad]] = dict()
 
     def craft_squad_id(self, selection: tuple[Member]) -> str:
-        if len(selection) != 4:
-            raise ValueError("Squad must have four (4) members")
-        return f"{selection[0].id}{selection[1].id}{selection[2].id}{selection[3].id}"
+        if len(selection) != self.squad_size:
+            raise ValueError(f"Squad must have {self.squad_size} members")
+        ids = [str(member.id) for member in selection]
+        # Single-digit ids are glued together, like "1234"
+        if all(len(id) == 1 for id in ids):
+            return "".join(ids)
+        return "-".join(ids)
+
+    def nb_possible_squads(self) -> int:
+        return comb(len(self.members), self.squad_size)
+
+    def squads_fit_in_memory(self) -> bool:
+        return self.nb_possible_squads() <= self.max_built_squads
+
+    def iter_squads(self):
+        """Yields every possible squad, "sorted" by member ID, one at a time."""
+        for selection in combinations(self.members, self.squad_size):
+            yield Squad(self.craft_squad_id(selection), selection)
 
     def build_squads(self) -> None:
         squads_have_been_built = len(self.squads) > 0
         if squads_have_been_built:
             # Then don't build them again.
             return
+        if not self.squads_fit_in_memory():
+            # Then the queries will search the members directly.
+            return
         
-        # Build squads, "sorted" by member ID
-        for selection in combinations(self.members, 4):
-            id = self.craft_squad_id(selection)
-            members = selection
-            self.squads.append(Squad(id, members))
+        with instrumentation.phase("build_squads"):
+            self.squads = list(self.iter_squads())
         
-        # Build the different sortings of the squads.
-        #   We are storing them all in memory, because
-        #   squads are at most 4 members, and there can
-        #   be at most 8 members in the squadron.
-        #   
-        #   There are only 70 ways to choose 4 items
-        #   from a set of 8. (https://www.wolframalpha.com/input/?i=8+choose+4)
-        #
-        #   We believe that a list of 70 items is negligible.
-        #
-        #   Also, we are assuming that Python will only create 70 Squad objects,
-        #   and that all the lists will only contain pointers to these same
-        #   70 objects. That might be wrong.
-        self.squads_by_asc_aggr = sorted(self.squads, key=attrgetter('aggregate'))
-        self.squads_by_des_aggr = sorted(self.squads, key=attrgetter('aggregate'), reverse=True)
-        self.squads_by_asc_phy  = sorted(self.squads, key=attrgetter('attr.phy', 'aggregate'))
-        self.squads_by_des_phy  = sorted(self.squads, key=attrgetter('attr.phy', 'aggregate'), reverse=True)
-        self.squads_by_asc_men  = sorted(self.squads, key=attrgetter('attr.men', 'aggregate'))
-        self.squads_by_des_men  = sorted(self.squads, key=attrgetter('attr.men', 'aggregate'), reverse=True)
-        self.squads_by_asc_tac  = sorted(self.squads, key=attrgetter('attr.tac', 'aggregate'))
-        self.squads_by_des_tac  = sorted(self.squads, key=attrgetter('attr.tac', 'aggregate'), reverse=True)
+            # A single index replaces the different sortings of the squads
+            #   that we used to keep in memory.
+            self.squad_index = SquadIndex(self.squads)
+            self.squad_bitsets = SquadBitsets(self.squads)
+            self.squad_index_is_stale = False
+
+            self.squads_by_member_id = {member.id: [] for member in self.members}
+            for position, squad in enumerate(self.squads):
+                self.squad_positions[squad.id] = position
+                for member in squad.members:
+                    self.squads_by_member_id[member.id].append(squad)
         return
 
+    def reset_squads(self) -> None:
+        """Forgets everything that was built, to start from scratch."""
+        self.squads = list()
+        self.squad_index = None
+        self.squad_index_is_stale = False
+        self.squad_bitsets = None
+        self.squads_by_member_id = dict()
+        self.squad_positions = dict()
+        self.lowest_squad_cache = dict()
+
     def iter_available_missions(self):
         return filter(lambda mi: mi.is_available, self.missions)
     
@@ -282,13 +281,20 @@ class Squadron:
         training_attr: Attributes,
         squads_list: list[Squad] = None
     ):
-        """Default value for `squads_list` is `self.squads`"""
+        """Default value for `squads_list` is `self.squads`, or every
+        possible squad (generated lazily) if they were not built."""
         if squads_list is None:
-            squads_list = self.squads
+            self.build_squads()
+            squads_list = self.squads if len(self.squads) > 0 else self.iter_squads()
 
+        # Packed attributes: one integer addition and one subtraction
+        #   per squad, instead of a new `Attributes` object.
+        packed_training = training_attr.pack()
+        packed_requirements = mission.requirements.pack()
         for squad in squads_list:
-            attr = squad.attr + training_attr
-            if attr.clears(mission.requirements):
+            if instrumentation.enabled:
+                instrumentation.count("squads.scanned")
+            if packed_clears(squad.packed_attr + packed_training, packed_requirements):
                 yield squad
             else:
                 continue
@@ -302,19 +308,181 @@ class Squadron:
         for the specified mission.
         
         If there are no qualifying squads, returns None."""
-        lowest_as_iter = islice(
-            self.iter_qualifying_squads_for_mission(
-                mission, 
-                training_attr, 
-                self.squads_by_asc_aggr),
-            1)
-        lowest_as_list = list(lowest_as_iter)
-        if len(lowest_as_list) == 0:
-            lowest = None
+        gap = mission.requirements - training_attr
+        return self.find_lowest_squad_for_gap(gap.phy, gap.men, gap.tac)
+
+    def get_squad_index(self) -> Optional[SquadIndex]:
+        """The up-to-date index of the squads, or None if there are too
+        many squads to build them all."""
+        self._refresh_stale_index()
+        return self.squad_index
+
+    def get_squad_bitsets(self) -> Optional[SquadBitsets]:
+        """The up-to-date bitsets of the squads, or None if there are too
+        many squads to build them all."""
+        self._refresh_stale_index()
+        return self.squad_bitsets
+
+    def _refresh_stale_index(self) -> None:
+        self.build_squads()
+        if self.squad_index is not None and self.squad_index_is_stale:
+            self.squad_index = SquadIndex(self.squads)
+            self.squad_bitsets = SquadBitsets(self.squads)
+            self.squad_index_is_stale = False
+
+    def qualifying_squads_bitset(self, mission: Mission, training_attr: Attributes) -> int:
+        """The squads that qualify for the mission, as a bitset over
+        `self.squads` (see `SquadBitsets`). Requires the squads to be
+        built: check `squads_fit_in_memory()` first."""
+        squad_bitsets = self.get_squad_bitsets()
+        if squad_bitsets is None:
+            raise ValueError(f"{self.nb_possible_squads()} squads are too many to build them all")
+        return squad_bitsets.for_mission(mission.requirements, training_attr)
+
+    def count_qualifying_squads(self, mission: Mission, training_attr: Attributes) -> int:
+        squad_bitsets = self.get_squad_bitsets()
+        if squad_bitsets is None:
+            return sum(1 for _ in self.iter_qualifying_squads_for_mission(mission, training_attr))
+        return SquadBitsets.count(squad_bitsets.for_mission(mission.requirements, training_attr))
+
+    def find_lowest_squad_for_gap(self, phy: int, men: int, tac: int) -> Optional[Squad]:
+        """Find the squad with the lowest aggregate that has at least
+        these attributes by itself."""
+        self.build_squads()
+        if instrumentation.enabled:
+            instrumentation.count("lowest_squad.queries")
+
+        gap = (phy, men, tac)
+        if gap in self.lowest_squad_cache:
+            if instrumentation.enabled:
+                instrumentation.count("lowest_squad.cache_hits")
+            return self.lowest_squad_cache[gap]
+
+        squad_index = self.get_squad_index()
+        if squad_index is not None:
+            lowest = squad_index.find_lowest(phy, men, tac)
         else:
-            lowest = lowest_as_list[0]
+            # Too many squads to build them all
+            selection = find_lowest_squad_members(self.members, phy, men, tac, self.squad_size)
+            if selection is None:
+                lowest = None
+            else:
+                lowest = Squad(self.craft_squad_id(selection), selection)
+
+        self.lowest_squad_cache[gap] = lowest
         return lowest
 
+    def find_member(self, member_id: int) -> Member:
+        for member in self.members:
+            if member.id == member_id:
+                return member
+        raise KeyError(f"No member with id {member_id}")
+
+    def find_mission(self, name: str) -> Mission:
+        for mission in self.missions:
+            if mission.name == name:
+                return mission
+        raise KeyError(f"No mission named {name!r}")
+
+    def update_member(
+        self,
+        member_id: int,
+        attr: Optional[Attributes] = None,
+        level: Optional[int] = None
+    ) -> None:
+        """Changes a member, and only recalculates the squads that include
+        that member, and the cached answers that they can change."""
+        member = self.find_member(member_id)
+        if level is not None:
+            member.level = level
+        if attr is None or attr == member.attr:
+            return
+        member.attr = attr
+
+        if len(self.squads) == 0:
+            # Nothing built, so we can't tell which answers are still good.
+            self.lowest_squad_cache = dict()
+            return
+
+        changed_squads = self.squads_by_member_id[member_id]
+        for squad in changed_squads:
+            squad.update_attr()
+        self.squad_index_is_stale = True
+
+        def rank(squad: Squad) -> tuple[int, int]:
+            return squad.aggregate, self.squad_positions[squad.id]
+
+        # A cached answer is still good if it doesn't include the member,
+        #   and none of the changed squads now beat it.
+        for gap, lowest in list(self.lowest_squad_cache.items()):
+            if lowest is not None and any(m.id == member_id for m in lowest.members):
+                del self.lowest_squad_cache[gap]
+                continue
+            phy, men, tac = gap
+            for squad in changed_squads:
+                if (squad.attr.phy >= phy and squad.attr.men >= men and squad.attr.tac >= tac
+                        and (lowest is None or rank(squad) < rank(lowest))):
+                    lowest = squad
+            self.lowest_squad_cache[gap] = lowest
+
+    def set_mission_available(self, name: str, is_available: bool) -> None:
+        # The cached answers are by gap, so they stay good.
+        self.find_mission(name).is_available = is_available
+
+    def set_training_attr(self, training_attr: Attributes) -> None:
+        # The cached answers are by gap, so they stay good.
+        self.training_attr = training_attr
+
+    def update_from(self, other: 'Squadron') -> None:
+        """Applies a newer export of the same squadron (eg: from
+        `csvparser.load_squadron`), and only recalculates what changed.
+
+        After any sequence of updates, the answers must be the same as
+        those of a squadron built from scratch with the same data:
+
+            >>> import copy, glob, os
+            >>> from csvparser import load_squadron
+            >>> def answers(squadron):
+            ...     programs = [TrainingProgram(courses, squadron.training_attr,
+            ...                                 squadron.max_training_attr)
+            ...                 for courses in [(), (Course.PHY,), (Course.MEN_TAC, Course.TAC)]]
+            ...     return [(program.attr, mission.name,
+            ...              squadron.count_qualifying_squads(mission, program.attr),
+            ...              str(squadron.find_lowest_qualifying_squad(mission, program.attr)),
+            ...              mission in squadron.iter_doable_missions_with_program(program))
+            ...             for program in programs for mission in squadron.missions]
+            >>> def rebuilt(squadron):
+            ...     return Squadron(copy.deepcopy(squadron.members), copy.deepcopy(squadron.missions),
+            ...                     squadron.training_attr, squadron.max_training_attr)
+            >>> directory = os.path.dirname(os.path.abspath(__file__))
+            >>> exports = sorted(glob.glob(os.path.join(directory, 'Squadron-*.csv')))
+            >>> squadron = load_squadron(exports[0])
+            >>> _ = answers(squadron)  # Fill the caches
+            >>> for export in exports[1:]:
+            ...     squadron.update_from(load_squadron(export))
+            ...     assert answers(squadron) == answers(load_squadron(export)), export
+            >>> best = squadron.find_lowest_qualifying_squad(squadron.missions[0], squadron.training_attr)
+            >>> squadron.update_member(best.members[0].id, Attributes(0, 0, 0), level=1)
+            >>> squadron.update_member(squadron.members[-1].id, Attributes(200, 200, 200))
+            >>> squadron.set_mission_available(squadron.missions[0].name, False)
+            >>> squadron.set_training_attr(Attributes(100, 100, 80))
+            >>> answers(squadron) == answers(rebuilt(squadron))
+            True
+        """
+        old_ids = sorted(member.id for member in self.members)
+        new_ids = sorted(member.id for member in other.members)
+        if old_ids != new_ids:
+            # Members joined or left, so the squads themselves changed.
+            self.members = other.members
+            self.reset_squads()
+        else:
+            for new_member in other.members:
+                self.update_member(new_member.id, new_member.attr, new_member.level)
+
+        self.missions = other.missions
+        self.set_training_attr(other.training_attr)
+        self.max_training_attr = other.max_training_attr
+
     def mission_is_doable_with_program(
         self, 
         mission: Mission, 
@@ -322,11 +490,10 @@ class Squadron:
     ) -> bool:
         """If any squad clears the requirements of the specified mission
         with the specified training program, then True. Otherwise, False."""
-        for squad in self.squads:
-            attr = squad.attr + program.attr
-            if attr.clears(mission.requirements):
-                return True
-        return False
+        squad_bitsets = self.get_squad_bitsets()
+        if squad_bitsets is not None:
+            return squad_bitsets.for_mission(mission.requirements, program.attr) != 0
+        return self.find_lowest_qualifying_squad(mission, program.attr) is not None
 
     def iter_doable_missions_with_program(self, program: TrainingProgram):
         for mission in self.iter_available_missions():
@@ -341,194 +508,3 @@ class Squadron:
             if squad is None:
                 continue
             print(f"{squad} {mission} {program}")
-
-
-
-
-# INPUT DATA
-#   Hardcoded for development, because I don't want to deal with 
-#   the logic of Squadron Training Attributes
-training_attr = Attributes(20, 120, 140)
-max_training_attr = 280
-
-#   And also, I didn't want to deal with how to architect my whole
-#   project to deal with the CSV parsing etc etc.
-
-members = [
-    Member(id=1, attr=Attributes(101,26,57), level=45, name="Cecily",            job="Gladiator"),
-    Member(id=2, attr=Attributes(40,26,114), level=43, name="Nanasomi",          job="Archer"),
-    Member(id=3, attr=Attributes(110,26,46), level=44, name="Hastaloeya",        job="Marauder"),
-    Member(id=4, attr=Attributes(62,36,76), level=40, name="Totodi",            job="Pugilist"),
-    Member(id=5, attr=Attributes(56,24,94), level=40, name="Inghilswys",        job="Lancer"),
-    Member(id=6, attr=Attributes(24,88,62), level=40, name="Sofine",            job="Scholar"),
-    Member(id=7, attr=Attributes(25,101,50), level=41, name="Nunulupa Tatalupa", job="Thaumaturge"),
-    Member(id=8, attr=Attributes(26,120,34), level=43, name="Awayuki",           job="Conjurer"),
-]
-
-#   Yes, I copy-pasted the CSV in the python file, and then I used
-#       the multi-column cursor in Visual Studio Code.
-#   Yes, I also went and manually updated the data when I got the 
-#       Squadron-2021-09-16.csv file.
-#   This is now the third time that I manually update this data, and I will
-#       probably reimplement the whole thing in Excel before I code a proper
-#       CSV parser lol.
-#       (Excel would help tremendously with the taming of the output...)
-#       (And also, that CSV "input" is first written in Excel lol.)
-
-missions = [
-Mission(requirements=Attributes(165,170,150),name="Military Courier", level=1, xp_reward=7500, ),
-Mission(requirements=Attributes(150,255,195),name="Outskirts Patrol", level=1, xp_reward=9000, ),
-Mission(requirements=Attributes(155,195,250),name="Beastmen Recon", level=5, xp_reward=10500, ),
-Mission(requirements=Attributes(305,210,130),name="Supply Wagon Escort", level=10, xp_reward=12000, ),
-Mission(requirements=Attributes(320,145,225),name="Pest Eradication", level=15, xp_reward=13500, ),
-Mission(requirements=Attributes(265,435,125),name="Frontline Support", level=20, xp_reward=15000, ),
-Mission(requirements=Attributes(270,145,425),name="Officer Escort", level=20, xp_reward=16500, ),
-Mission(requirements=Attributes(280,155,435),name="Border Patrol", level=25, xp_reward=19500, is_available=False),
-Mission(requirements=Attributes(440,175,300),name="Stronghold Recon", level=30, xp_reward=22500, ),
-Mission(requirements=Attributes(455,315,190),name="Search and Rescue", level=35, xp_reward=25500, ),
-Mission(requirements=Attributes(170,480,310),name="Allied Maneuvers", level=35, xp_reward=27000, is_available=False),
-Mission(requirements=Attributes(315,325,340),name="Flagged Mission: Crystal Recovery", level=40, xp_reward=30000, ),
-]
-# To copy-paste the is_available:
-# Mission(requirements=Attributes(165,170,150),name="Military Courier", level=1, xp_reward=7500, is_available=False),
-
-#   But to manually update the mission attributes, I used the multi-column
-#       cursor in Visual Studio Code.
-#   Also, I forgot to add the level 40 mission when I manually "updated"
-#       for the 2021-09-17 -_-
-
-sq = Squadron(members, missions, training_attr, max_training_attr)
-
-print("Squadron Members:")
-print(*sq.members, sep='\n')
-
-sq.build_squads()
-print("Squads:")
-print(*sq.squads, sep='\n')
-print()
-# print("Squads by aggregate:")
-# print(*sq.squads_by_asc_aggr, sep='\n')
-# print()
-# print("Squads by aggregate descending:")
-# print(*sq.squads_by_des_aggr, sep='\n')
-# print()
-# print("Squads by Physical:")
-# print(*sq.squads_by_asc_phy, sep='\n')
-# print()
-# print("Squads by Physical descending:")
-# print(*sq.squads_by_des_phy, sep='\n')
-# print()
-# print("Squads by Mental:")
-# print(*sq.squads_by_asc_men, sep='\n')
-# print()
-# print("Squads by Mental descending:")
-# print(*sq.squads_by_des_men, sep='\n')
-# print()
-# print("Squads by Tactical:")
-# print(*sq.squads_by_asc_tac, sep='\n')
-# print()
-# print("Squads by Tactical descending:")
-# print(*sq.squads_by_des_tac, sep='\n')
-# print()
-
-# print("Available Missions")
-# print(*sq.iter_available_missions(), sep='\n')
-
-print("Nb of qualifying squad for each available mission")
-for mission in sq.iter_available_missions():
-    nb = len(list(sq.iter_qualifying_squads_for_mission(mission, sq.training_attr)))
-    print(f"{nb}\t{mission}")
-
-print("Lowest qualifying squad for each available mission")
-for mission in sq.iter_available_missions():
-    squad = sq.find_lowest_qualifying_squad(mission, sq.training_attr)
-    print(f"{squad}\t{mission}")
-
-# Tests for training courses:
-print()
-print("Training courses")
-print(training_attr)
-print(max_training_attr)
-
-prog1 = TrainingProgram((Course.PHY,), training_attr, max_training_attr)
-print(prog1)
-
-print()
-print("Resulting delta for specified course on specifiied initial stats")
-print(f"Initial\t{training_attr}")
-for course in list(Course):
-    new_attr = prog1.calculate_one_course(training_attr, course)
-    delta = new_attr - training_attr
-    print(f"{course.name:7}\t{new_attr}    {delta}")
-print("****************")
-
-print()
-print("Doable missions with no training")
-empty_prog = TrainingProgram(tuple(), training_attr, max_training_attr)
-print(empty_prog)
-print(*sq.iter_doable_missions_with_program(empty_prog), sep='\n')
-print("****************")
-
-print()
-print("Doable missions with one course, grouped by course")
-print(f"Initial\t{training_attr}")
-for course in list(Course):
-    prog = TrainingProgram((course,), training_attr, max_training_attr)
-    print(prog)
-    print(*sq.iter_doable_missions_with_program(prog), sep='\n')
-    print()
-print("****************")
-
-threshold_nb_doable_missions_1_courses = 6
-print()
-print("Doable missions with two courses, grouped by training program")
-print(f"Initial\t{training_attr}")
-for courses in product(list(Course), repeat=2):
-    prog = TrainingProgram(courses, training_attr, max_training_attr)
-    doable_missions = list(sq.iter_doable_missions_with_program(prog))
-    if prog.is_redundant:
-        continue
-    # If training prog offers no new missions:
-    if len(doable_missions) <= threshold_nb_doable_missions_1_courses:
-        continue
-    print(prog)
-    print(*doable_missions, sep='\n')
-    print()
-print("****************")
-
-threshold_nb_doable_missions_2_courses = 6
-print()
-print("Doable missions with three courses, grouped by training program")
-print(f"Initial\t{training_attr}")
-for courses in product(list(Course), repeat=3):
-    prog = TrainingProgram(courses, training_attr, max_training_attr)
-    doable_missions = list(sq.iter_doable_missions_with_program(prog))
-    if prog.is_redundant:
-        continue
-    # If training prog offers no new missions:
-    if len(doable_missions) <= threshold_nb_doable_missions_2_courses:
-        continue
-    print(prog)
-    print(*doable_missions, sep='\n')
-    print()
-print("****************")
-
-# print()
-# print(f"Initial\t{training_attr}")
-# for courses in product(list(Course), repeat=3):
-#     prog = TrainingProgram(courses, training_attr, max_training_attr)
-#     if prog.is_redundant:
-#         continue
-#     doable_missions = list(sq.iter_doable_missions_with_program(prog))
-#     if len(doable_missions) <= 3:
-#         continue
-#     print(prog)
-#     print(*doable_missions, sep='\n')
-#     print()
-
-
-train_prog = TrainingProgram((Course.PHY_MEN, Course.PHY, Course.PHY,), training_attr, max_training_attr)
-print()
-print(train_prog)
-sq.print_lowest_squad_for_all_doable_missions(train_prog)
-
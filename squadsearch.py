@@ -0,0 +1,137 @@
+import instrumentation
+from bisect import insort
+from typing import Optional
+
+
+def find_lowest_squad_members(
+    members: list,
+    gap_phy: int,
+    gap_men: int,
+    gap_tac: int,
+    squad_size: int = 4
+) -> Optional[tuple]:
+    """Finds the `squad_size` members with the lowest aggregate whose
+    attributes add up to at least (`gap_phy`, `gap_men`, `gap_tac`),
+    without going through every combination of members.
+
+    Returns the members in the same order as `members`, or None.
+    When several selections have the same aggregate, the one that comes
+    first in `combinations(members, squad_size)` wins, like with a fully
+    built list of squads.
+
+    Branch and bound: members are tried by increasing aggregate, and a
+    partial selection is dropped as soon as...
+      * even the cheapest remaining members would cost more than the best
+        squad found so far (or as much, and the best squad comes first
+        anyway), or
+      * even the strongest remaining members on one attribute couldn't
+        close the gap on that attribute.
+
+    Same answers as going through every combination, ties included:
+
+        >>> import random
+        >>> from itertools import combinations
+        >>> from attributes import Attributes
+        >>> from squadronplanner import Member
+        >>> rng = random.Random(0)
+        >>> members = [Member(str(i), Attributes(*(20 * rng.randint(0, 6) for _ in range(3))), 1, "")
+        ...            for i in range(9)]
+        >>> def brute_force(gap, squad_size):
+        ...     qualifying = [selection for selection in combinations(members, squad_size)
+        ...                   if all(sum(getattr(m.attr, axis) for m in selection) >= value
+        ...                          for axis, value in zip(('phy', 'men', 'tac'), gap))]
+        ...     return min(qualifying, default=None,
+        ...                key=lambda selection: sum(m.attr.aggregate() for m in selection))
+        >>> gaps = [tuple(20 * rng.randint(0, 18) for _ in range(3)) for _ in range(300)]
+        >>> all(find_lowest_squad_members(members, *gap, squad_size) == brute_force(gap, squad_size)
+        ...     for gap in gaps for squad_size in (1, 3, 4))
+        True
+
+    Ties don't turn the search into going through every combination:
+
+        >>> import instrumentation
+        >>> twins = [Member(str(i), Attributes(40, 40, 40), 1, "") for i in range(50)]
+        >>> instrumentation.enable(); instrumentation.reset()
+        >>> [member.name for member in find_lowest_squad_members(twins, 0, 0, 0)]
+        ['0', '1', '2', '3']
+        >>> instrumentation.counters["lowest_squad.search_nodes_explored"] < 100
+        True
+        >>> instrumentation.disable()
+    """
+    nb_members = len(members)
+    if squad_size > nb_members:
+        return None
+
+    # By aggregate, then position: among members that tie, the ones that
+    #   come first in `combinations()` order are tried first.
+    order = sorted(range(nb_members),
+                   key=lambda position: (members[position].attr.aggregate(), position))
+    phys = [members[position].attr.phy for position in order]
+    mens = [members[position].attr.men for position in order]
+    tacs = [members[position].attr.tac for position in order]
+    aggrs = [phy + men + tac for phy, men, tac in zip(phys, mens, tacs)]
+
+    # cheapest[i][r]: lowest aggregate of r members taken from order[i:]
+    # best_phy[i][r]: highest phy of r members taken from order[i:] (etc.)
+    cheapest = [[0] * (squad_size + 1) for _ in range(nb_members + 1)]
+    best_phy = [[0] * (squad_size + 1) for _ in range(nb_members + 1)]
+    best_men = [[0] * (squad_size + 1) for _ in range(nb_members + 1)]
+    best_tac = [[0] * (squad_size + 1) for _ in range(nb_members + 1)]
+    # first_positions[i]: the `squad_size` smallest positions in order[i:]
+    first_positions = [[] for _ in range(nb_members + 1)]
+    suffix_aggrs, suffix_phys, suffix_mens, suffix_tacs = [], [], [], []
+    for i in range(nb_members - 1, -1, -1):
+        first_positions[i] = sorted(first_positions[i + 1] + [order[i]])[:squad_size]
+        insort(suffix_aggrs, aggrs[i])
+        insort(suffix_phys, -phys[i])
+        insort(suffix_mens, -mens[i])
+        insort(suffix_tacs, -tacs[i])
+        for r in range(1, min(squad_size, nb_members - i) + 1):
+            cheapest[i][r] = cheapest[i][r - 1] + suffix_aggrs[r - 1]
+            best_phy[i][r] = best_phy[i][r - 1] - suffix_phys[r - 1]
+            best_men[i][r] = best_men[i][r - 1] - suffix_mens[r - 1]
+            best_tac[i][r] = best_tac[i][r - 1] - suffix_tacs[r - 1]
+
+    best_key = None
+    chosen = []
+    nb_explored = 0
+
+    def explore(i: int, phy: int, men: int, tac: int, aggr: int) -> None:
+        nonlocal best_key, nb_explored
+        nb_explored += 1
+        nb_missing = squad_size - len(chosen)
+        if nb_missing == 0:
+            if phy >= gap_phy and men >= gap_men and tac >= gap_tac:
+                key = (aggr, tuple(sorted(chosen)))
+                if best_key is None or key < best_key:
+                    best_key = key
+            return
+        if nb_members - i < nb_missing:
+            return
+        if best_key is not None:
+            lowest_aggr = aggr + cheapest[i][nb_missing]
+            if lowest_aggr > best_key[0]:
+                return
+            if lowest_aggr == best_key[0]:
+                # A tie at best: this subtree only matters if one of its
+                #   selections comes before the best one, and the earliest
+                #   it could have is with the first positions left.
+                earliest = tuple(sorted(chosen + first_positions[i][:nb_missing]))
+                if earliest >= best_key[1]:
+                    return
+        if (phy + best_phy[i][nb_missing] < gap_phy
+                or men + best_men[i][nb_missing] < gap_men
+                or tac + best_tac[i][nb_missing] < gap_tac):
+            return
+
+        chosen.append(order[i])
+        explore(i + 1, phy + phys[i], men + mens[i], tac + tacs[i], aggr + aggrs[i])
+        chosen.pop()
+        explore(i + 1, phy, men, tac, aggr)
+
+    explore(0, 0, 0, 0, 0)
+    if instrumentation.enabled:
+        instrumentation.count("lowest_squad.search_nodes_explored", nb_explored)
+    if best_key is None:
+        return None
+    return tuple(members[position] for position in best_key[1])
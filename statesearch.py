@@ -0,0 +1,136 @@
+from attributes import Attributes
+from dataclasses import dataclass
+from typing import Callable, Optional
+from squadronplanner import Course, Mission, Squadron, TrainingProgram, get_transition_table
+
+
+@dataclass
+class ReachableState:
+    attr: Attributes
+    nb_courses: int
+
+    def __str__(self):
+        return f"{self.attr}    ({self.nb_courses} courses)"
+
+
+class StateSearch:
+    """Breadth-first search over the training states reachable from
+    `initial_attr`.
+
+    Each state is only visited once, at the smallest number of courses that
+    reaches it, so the search stays bounded by the number of training states
+    no matter how many courses we look at. (6^k course sequences, but only
+    a few hundred states.)
+
+    A shortest sequence never contains a useless course (that would be a
+    loop back to the same state), so none of them are redundant.
+
+    Levels are only expanded when a query needs them.
+    """
+
+    def __init__(self, initial_attr: Attributes, max_aggregate: int):
+        self.initial_attr = initial_attr
+        self.max_aggregate = max_aggregate
+        self.table = get_transition_table(max_aggregate)
+        self.courses = list(Course)
+
+        start = self.table.index_of.get(initial_attr)
+        if start is None:
+            raise ValueError(f"{initial_attr} is not a valid training state "
+                             f"for max_aggregate={max_aggregate}")
+
+        self.start = start
+        # Smallest number of courses to reach each state
+        self.depth_of: dict[int, int] = {start: 0}
+        # (previous state, course index) for every shortest way to a state
+        self.parents: dict[int, list[tuple[int, int]]] = {start: []}
+        self.levels: list[list[int]] = [[start]]
+
+    def _expand_next_level(self) -> bool:
+        """Returns False when there are no more states to discover."""
+        frontier = self.levels[-1]
+        if len(frontier) == 0:
+            return False
+
+        depth = len(self.levels)
+        new_level = []
+        for state in frontier:
+            for course_index in range(self.table.nb_courses):
+                new_state = self.table.next_index(state, course_index)
+                known_depth = self.depth_of.get(new_state)
+                if known_depth is None:
+                    self.depth_of[new_state] = depth
+                    self.parents[new_state] = [(state, course_index)]
+                    new_level.append(new_state)
+                elif known_depth == depth:
+                    # Another shortest way to a state found in this level
+                    self.parents[new_state].append((state, course_index))
+        self.levels.append(new_level)
+        return len(new_level) > 0
+
+    def iter_states(self, max_courses: Optional[int] = None):
+        """Yields every reachable state, by increasing number of courses."""
+        depth = 0
+        while max_courses is None or depth <= max_courses:
+            if depth == len(self.levels) and not self._expand_next_level():
+                return
+            for state in self.levels[depth]:
+                yield ReachableState(self.table.states[state], depth)
+            depth += 1
+
+    def states_within(self, max_courses: int) -> list[ReachableState]:
+        return list(self.iter_states(max_courses))
+
+    def find_first(
+        self,
+        predicate: Callable[[Attributes], bool],
+        max_courses: Optional[int] = None
+    ) -> Optional[ReachableState]:
+        """The state with the fewest courses for which `predicate(attr)` is
+        True. Stops searching as soon as it is found."""
+        for reachable in self.iter_states(max_courses):
+            if predicate(reachable.attr):
+                return reachable
+        return None
+
+    def iter_shortest_programs(self, attr: Attributes):
+        """Yields every shortest course sequence that reaches `attr`,
+        as tuples of `Course`."""
+        state = self.table.index_of.get(attr)
+        if state is None or state not in self.depth_of:
+            return
+        yield from self._iter_paths_to(state)
+
+    def _iter_paths_to(self, state: int):
+        if state == self.start:
+            yield tuple()
+            return
+        for previous, course_index in self.parents[state]:
+            for path in self._iter_paths_to(previous):
+                yield path + (self.courses[course_index],)
+
+    def shortest_program(self, attr: Attributes) -> Optional[TrainingProgram]:
+        for courses in self.iter_shortest_programs(attr):
+            return TrainingProgram(courses, self.initial_attr, self.max_aggregate)
+        return None
+
+
+def min_courses_to_unlock(
+    squadron: Squadron,
+    mission: Mission,
+    max_courses: Optional[int] = None,
+    search: Optional[StateSearch] = None
+) -> Optional[TrainingProgram]:
+    """Shortest training program after which at least one squad clears the
+    mission, or None if no reachable state (within `max_courses`) does it."""
+    squadron.build_squads()
+    if search is None:
+        search = StateSearch(squadron.training_attr, squadron.max_training_attr)
+
+    def unlocks_mission(attr: Attributes) -> bool:
+        return squadron.find_lowest_qualifying_squad(mission, attr) is not None
+
+    reachable = search.find_first(unlocks_mission, max_courses)
+    if reachable is None:
+        return None
+    return search.shortest_program(reachable.attr)
@@ -0,0 +1,228 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from attributes import Attributes
+from typing import Callable, Optional, Sequence
+
+# File layout (native byte order, flagged in the header):
+#   header:      magic, byte order, version, max_aggregate, nb_states, nb_courses
+#   states:      nb_states * 3 unsigned shorts (phy, men, tac)
+#   next states: nb_states * nb_courses unsigned shorts (index of next state)
+_MAGIC = b'SQTT'
+_HEADER = struct.Struct('=4sBBHHH')
+_BYTE_ORDER = 1 if sys.byteorder == 'little' else 2
+_FILE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.squadron-cache')
+
+
+def iter_training_states(max_aggregate: int, step: int = 20):
+    r"""Every squadron training state: each attribute a multiple of `step`,
+    and the three of them summing to at most `max_aggregate`.
+
+        >>> states = list(iter_training_states(40))
+        >>> print(*states, sep='\n')
+        (  0 /   0 /   0)
+        (  0 /   0 /  20)
+        (  0 /   0 /  40)
+        (  0 /  20 /   0)
+        (  0 /  20 /  20)
+        (  0 /  40 /   0)
+        ( 20 /   0 /   0)
+        ( 20 /   0 /  20)
+        ( 20 /  20 /   0)
+        ( 40 /   0 /   0)
+    """
+    for phy in range(0, max_aggregate + 1, step):
+        for men in range(0, max_aggregate - phy + 1, step):
+            for tac in range(0, max_aggregate - phy - men + 1, step):
+                yield Attributes(phy, men, tac)
+
+
+class TransitionTable:
+    """Precomputed result of every course, on every training state.
+
+    Courses are referred to by their index (`course.value - 1`), and states
+    by their position in `self.states`. A course is useless on a state when
+    it leads back to that same state.
+    """
+
+    def __init__(
+        self,
+        max_aggregate: int,
+        nb_courses: int,
+        state_values: Sequence[int],
+        next_states: Sequence[int]
+    ):
+        self.max_aggregate = max_aggregate
+        self.nb_courses = nb_courses
+        self.state_values = state_values
+        self.next_states = next_states
+        self.states = [Attributes(*state_values[i:i+3])
+                       for i in range(0, len(state_values), 3)]
+        self.index_of = {state: index for index, state in enumerate(self.states)}
+
+    @classmethod
+    def build(
+        cls,
+        max_aggregate: int,
+        nb_courses: int,
+        apply_course: Callable[[Attributes, int], Attributes]
+    ) -> 'TransitionTable':
+        """`apply_course(state, course_index)` defines the training rules."""
+        states = list(iter_training_states(max_aggregate))
+        index_of = {state: index for index, state in enumerate(states)}
+
+        state_values = array('H')
+        next_states = array('H')
+        for state in states:
+            state_values.extend((state.phy, state.men, state.tac))
+            for course_index in range(nb_courses):
+                next_state = apply_course(state, course_index)
+                next_index = index_of.get(next_state)
+                if next_index is None:
+                    raise ValueError(f"Course {course_index} leads from {state} to {next_state}, "
+                                     f"which is not a training state")
+                next_states.append(next_index)
+        return cls(max_aggregate, nb_courses, state_values, next_states)
+
+    def next_index(self, state_index: int, course_index: int) -> int:
+        return self.next_states[state_index * self.nb_courses + course_index]
+
+    def is_useless(self, state_index: int, course_index: int) -> bool:
+        return self.next_index(state_index, course_index) == state_index
+
+    def run_program(
+        self,
+        initial_attr: Attributes,
+        course_indexes: Sequence[int]
+    ) -> Optional[tuple[bool, Attributes]]:
+        """Same result as `TrainingProgram.calculate_program()`, or None if
+        `initial_attr` is not a valid training state."""
+        state = self.index_of.get(initial_attr)
+        if state is None:
+            return None
+
+        is_redundant = False
+        next_states = self.next_states
+        nb_courses = self.nb_courses
+        for course_index in course_indexes:
+            new_state = next_states[state * nb_courses + course_index]
+            if new_state == state:
+                is_redundant = True
+            state = new_state
+        return is_redundant, self.states[state]
+
+    def iter_paths(
+        self,
+        initial_index: int,
+        nb_courses: int,
+        skip_redundant: bool = False
+    ):
+        """Yields `(course_indexes, state_index, is_redundant)` for every
+        sequence of `nb_courses` courses from a state, in `product()` order.
+
+        The sequences are walked depth-first, so each prefix is looked up
+        once for all the sequences that share it, instead of once per
+        sequence. With `skip_redundant`, a prefix with a useless course is
+        dropped with everything below it.
+        """
+        if nb_courses == 0:
+            yield (), initial_index, False
+            return
+
+        next_states = self.next_states
+        nb_table_courses = self.nb_courses
+        path: list[int] = []
+        # (state reached by the prefix, is that prefix redundant, next course to try)
+        stack = [(initial_index, False, 0)]
+        while stack:
+            state, is_redundant, course_index = stack.pop()
+            if course_index == nb_table_courses:
+                if path:
+                    path.pop()
+                continue
+            # Come back for the next course of this prefix, after the subtree.
+            stack.append((state, is_redundant, course_index + 1))
+
+            new_state = next_states[state * nb_table_courses + course_index]
+            new_is_redundant = is_redundant or new_state == state
+            if new_is_redundant and skip_redundant:
+                continue
+            if len(path) + 1 == nb_courses:
+                yield (*path, course_index), new_state, new_is_redundant
+            else:
+                path.append(course_index)
+                stack.append((new_state, new_is_redundant, 0))
+
+    def save(self, path: str) -> bool:
+        """Best effort: returns False if the table could not be written
+        (eg: read-only cache directory), and the table stays in memory."""
+        header = _HEADER.pack(_MAGIC, _BYTE_ORDER, _FILE_VERSION,
+                              self.max_aggregate, len(self.states), self.nb_courses)
+        # Write to a temporary file first, so that a worker process never
+        # maps a half-written table.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                file.write(header)
+                array('H', self.state_values).tofile(file)
+                array('H', self.next_states).tofile(file)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path: str) -> Optional['TransitionTable']:
+        """Memory-maps a table saved with `save()`.
+
+        Returns None if the file was written by another version, or on a
+        machine with another byte order, or if it is not the size its
+        header says (eg: truncated)."""
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _HEADER.size:
+                return None
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byte_order, version, max_aggregate, nb_states, nb_courses = \
+            _HEADER.unpack_from(mapped)
+        if (magic, byte_order, version) != (_MAGIC, _BYTE_ORDER, _FILE_VERSION):
+            return None
+        if size != _HEADER.size + 2 * nb_states * (3 + nb_courses):
+            return None
+
+        values = memoryview(mapped)[_HEADER.size:].cast('H')
+        state_values = values[:nb_states * 3]
+        next_states = values[nb_states * 3:]
+        return cls(max_aggregate, nb_courses, state_values, next_states)
+
+
+def load_or_build(
+    path: str,
+    max_aggregate: int,
+    nb_courses: int,
+    apply_course: Callable[[Attributes, int], Attributes]
+) -> TransitionTable:
+    """The table saved at `path`, or a new one (saved there if possible).
+
+    A missing, damaged or unwritable cache only costs the time to build the
+    table again."""
+    table = None
+    try:
+        table = TransitionTable.load(path)
+    except (OSError, ValueError, TypeError):
+        pass
+    if table is not None and (table.max_aggregate, table.nb_courses) != (max_aggregate, nb_courses):
+        table = None
+    if table is None:
+        table = TransitionTable.build(max_aggregate, nb_courses, apply_course)
+        table.save(path)
+    return table